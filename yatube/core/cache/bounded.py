@@ -0,0 +1,224 @@
+"""Кэш процесса с ограничением по байтам и квотами по пространствам.
+
+В отличие от LocMemCache, который при MAX_ENTRIES удаляет треть
+записей наугад, здесь каждое пространство (страницы, карточки,
+объекты, счётчики) вытесняет свои давно не читанные записи, когда
+превышает квоту в байтах. Обход краулером тысяч страниц ленты
+вытесняет только другие страницы, а не карточки и счётчики.
+
+Пространство выбирается по префиксу ключа:
+
+    'OPTIONS': {
+        'MAX_BYTES': 8 * 2 ** 20,  # для ключей без пространства
+        'NAMESPACES': {
+            'pages': {
+                'PREFIXES': ['views.decorators.cache.'],
+                'MAX_BYTES': 32 * 2 ** 20,
+            },
+        },
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_NAMESPACE = 'default'
+DEFAULT_MAX_BYTES = 8 * 2 ** 20
+
+# Общие для всех экземпляров с одним LOCATION, как у LocMemCache
+_namespaces = {}
+_locks = {}
+
+
+class Namespace:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        # ключ -> (pickle значения, срок), в начале давно не читанные
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = self.rejected = 0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'rejected': self.rejected,
+        }
+
+    @staticmethod
+    def size_of(key, data):
+        return len(key) + len(data)
+
+    def get(self, key):
+        """pickle значения или None; промахи и попадания учитываются."""
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] is not None and (
+            entry[1] <= time.time()
+        ):
+            self.remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def has(self, key):
+        entry = self.entries.get(key)
+        return entry is not None and (
+            entry[1] is None or entry[1] > time.time()
+        )
+
+    def put(self, key, data, expires):
+        self.remove(key)
+        size = self.size_of(key, data)
+        if size > self.max_bytes:
+            self.rejected += 1
+            return False
+        while self.bytes + size > self.max_bytes:
+            oldest, (oldest_data, _) = self.entries.popitem(last=False)
+            self.bytes -= self.size_of(oldest, oldest_data)
+            self.evictions += 1
+        self.entries[key] = (data, expires)
+        self.bytes += size
+        return True
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes -= self.size_of(key, entry[0])
+        return True
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+
+class BoundedCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        config = {
+            DEFAULT_NAMESPACE: {
+                'PREFIXES': [],
+                'MAX_BYTES': options.get('MAX_BYTES', DEFAULT_MAX_BYTES),
+            },
+            **options.get('NAMESPACES', {}),
+        }
+        self._lock = _locks.setdefault(name, threading.Lock())
+        self._namespaces = _namespaces.setdefault(name, {
+            namespace: Namespace(int(value['MAX_BYTES']))
+            for namespace, value in config.items()
+        })
+        # Сначала длинные префиксы, чтобы вложенные имели приоритет
+        self._prefixes = sorted(
+            (
+                (prefix, namespace)
+                for namespace, value in config.items()
+                for prefix in value.get('PREFIXES', [])
+            ),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+
+    def namespace_of(self, key):
+        for prefix, namespace in self._prefixes:
+            if key.startswith(prefix):
+                return namespace
+        return DEFAULT_NAMESPACE
+
+    def _locate(self, key, version):
+        full_key = self.make_key(key, version=version)
+        self.validate_key(full_key)
+        return self._namespaces[self.namespace_of(key)], full_key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace, key = self._locate(key, version)
+        data = self._dumps(value)
+        with self._lock:
+            if namespace.has(key):
+                return False
+            return namespace.put(
+                key, data, self.get_backend_timeout(timeout)
+            )
+
+    def get(self, key, default=None, version=None):
+        namespace, key = self._locate(key, version)
+        with self._lock:
+            data = namespace.get(key)
+        if data is None:
+            return default
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace, key = self._locate(key, version)
+        data = self._dumps(value)
+        with self._lock:
+            namespace.put(key, data, self.get_backend_timeout(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        namespace, key = self._locate(key, version)
+        with self._lock:
+            if not namespace.has(key):
+                return False
+            data = namespace.entries[key][0]
+            namespace.entries[key] = (
+                data, self.get_backend_timeout(timeout)
+            )
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        namespace, key = self._locate(key, version)
+        with self._lock:
+            if not namespace.has(key):
+                raise ValueError(f"Key '{key}' not found")
+            data, expires = namespace.entries[key]
+            value = pickle.loads(data) + delta
+            namespace.put(key, self._dumps(value), expires)
+            return value
+
+    def has_key(self, key, version=None):
+        namespace, key = self._locate(key, version)
+        with self._lock:
+            return namespace.has(key)
+
+    def delete(self, key, version=None):
+        namespace, key = self._locate(key, version)
+        with self._lock:
+            namespace.remove(key)
+
+    def clear(self):
+        with self._lock:
+            for namespace in self._namespaces.values():
+                namespace.clear()
+
+    def stats(self):
+        """Счётчики по пространствам: записи, байты, квота, попадания,
+        промахи, вытеснения и отказы (значение больше квоты)."""
+        with self._lock:
+            return {
+                name: namespace.stats()
+                for name, namespace in self._namespaces.items()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            for namespace in self._namespaces.values():
+                namespace.reset_stats()
@@ -0,0 +1,323 @@
+"""Кэш в файле, отображённом в память, общий для процессов на хосте.
+
+Файл — хэш-таблица фиксированного размера: SLOTS ячеек по SLOT_SIZE
+байт, сгруппированных в наборы по WAYS ячеек. Ключ попадает в набор
+по хэшу и занимает в нём свободную, просроченную или давно не
+читанную ячейку (LRU внутри набора, как в кэшах процессора). Значение,
+которое не помещается в ячейку, не кэшируется.
+
+Доступ к набору защищён блокировкой fcntl на его байт в файле
+(между процессами) и общей для процесса блокировкой (между потоками:
+блокировки fcntl принадлежат процессу целиком).
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.shared.SharedMemoryCache',
+            'LOCATION': '/dev/shm/yatube.cache',
+            'OPTIONS': {'SLOTS': 4096, 'SLOT_SIZE': 64 * 1024},
+        }
+    }
+"""
+import fcntl
+import math
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from hashlib import blake2b
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'YTSC0001'
+# magic, slots, slot_size, ways
+FILE_HEADER = struct.Struct('<8sIII')
+# хэш ключа (0 — пустая ячейка), срок, последнее чтение, длины
+SLOT_HEADER = struct.Struct('<QdQII')
+
+DEFAULT_SLOTS = 1024
+DEFAULT_SLOT_SIZE = 64 * 1024
+DEFAULT_WAYS = 8
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+class Table:
+    """Отображение файла кэша; одно на файл в процессе.
+
+    Файл нельзя открывать повторно: закрытие любого его дескриптора
+    снимает все блокировки fcntl процесса на этот файл.
+    """
+
+    def __init__(self, path, slots, slot_size, ways):
+        if slot_size <= SLOT_HEADER.size:
+            raise ValueError('SLOT_SIZE меньше заголовка ячейки.')
+        self.slots = slots - slots % ways or ways
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = self.slots // ways
+        self.size = FILE_HEADER.size + self.slots * slot_size
+        self.lock = threading.RLock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self.lock, self.locked_file():
+            self.prepare_file()
+            self.map = mmap.mmap(self.fd, self.size)
+
+    def prepare_file(self):
+        header = FILE_HEADER.pack(
+            MAGIC, self.slots, self.slot_size, self.ways
+        )
+        if os.pread(self.fd, FILE_HEADER.size, 0) == header:
+            return
+        # Другая разметка или новый файл: начинаем с пустой таблицы
+        os.ftruncate(self.fd, 0)
+        os.ftruncate(self.fd, self.size)
+        os.pwrite(self.fd, header, 0)
+
+    @contextmanager
+    def locked_file(self):
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def locked_set(self, index):
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, index)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, index)
+
+    def set_of(self, key_hash):
+        return key_hash % self.sets
+
+    def offsets(self, index):
+        first = FILE_HEADER.size + index * self.ways * self.slot_size
+        return range(first, first + self.ways * self.slot_size,
+                     self.slot_size)
+
+    def read_header(self, offset):
+        return SLOT_HEADER.unpack_from(self.map, offset)
+
+    def find(self, index, key_hash, key):
+        """Смещение живой ячейки с ключом или None. Просроченные
+        ячейки освобождаются по пути."""
+        now = time.time()
+        for offset in self.offsets(index):
+            slot_hash, expires, _, key_len, _ = self.read_header(offset)
+            if slot_hash != key_hash:
+                continue
+            start = offset + SLOT_HEADER.size
+            if self.map[start:start + key_len] != key:
+                continue
+            if expires <= now:
+                self.clear_slot(offset)
+                return None
+            return offset
+        return None
+
+    def read(self, offset):
+        slot_hash, expires, _, key_len, value_len = self.read_header(offset)
+        SLOT_HEADER.pack_into(
+            self.map, offset, slot_hash, expires, time.monotonic_ns(),
+            key_len, value_len
+        )
+        start = offset + SLOT_HEADER.size + key_len
+        return pickle.loads(self.map[start:start + value_len])
+
+    def victim(self, index):
+        """Свободная или просроченная ячейка, иначе давно не читанная."""
+        now = time.time()
+        oldest, oldest_tick = None, None
+        for offset in self.offsets(index):
+            slot_hash, expires, tick, _, _ = self.read_header(offset)
+            if not slot_hash or expires <= now:
+                return offset
+            if oldest is None or tick < oldest_tick:
+                oldest, oldest_tick = offset, tick
+        return oldest
+
+    def write(self, offset, key_hash, key, data, expires):
+        SLOT_HEADER.pack_into(
+            self.map, offset, key_hash, expires, time.monotonic_ns(),
+            len(key), len(data)
+        )
+        start = offset + SLOT_HEADER.size
+        self.map[start:start + len(key)] = key
+        self.map[start + len(key):start + len(key) + len(data)] = data
+
+    def clear_slot(self, offset):
+        SLOT_HEADER.pack_into(self.map, offset, 0, 0, 0, 0, 0)
+
+    def fits(self, key, data):
+        return SLOT_HEADER.size + len(key) + len(data) <= self.slot_size
+
+    def clear(self):
+        with self.lock, self.locked_file():
+            for index in range(self.sets):
+                for offset in self.offsets(index):
+                    self.clear_slot(offset)
+
+
+def get_table(path, slots, slot_size, ways):
+    with _tables_lock:
+        table = _tables.get(path)
+        if table is None:
+            table = _tables[path] = Table(path, slots, slot_size, ways)
+        return table
+
+
+class SharedMemoryCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.table = get_table(
+            os.path.abspath(location),
+            int(options.get('SLOTS', DEFAULT_SLOTS)),
+            int(options.get('SLOT_SIZE', DEFAULT_SLOT_SIZE)),
+            int(options.get('WAYS', DEFAULT_WAYS)),
+        )
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        raw = key.encode()
+        # 0 зарезервирован за пустой ячейкой
+        key_hash = int.from_bytes(
+            blake2b(raw, digest_size=8).digest(), 'little'
+        ) | 1
+        return raw, key_hash
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return math.inf if expires is None else expires
+
+    def _group(self, keys, version):
+        """Ключи по наборам, чтобы брать блокировку набора один раз."""
+        groups = {}
+        for key in keys:
+            raw, key_hash = self._key(key, version)
+            groups.setdefault(self.table.set_of(key_hash), []).append(
+                (key, raw, key_hash)
+            )
+        return groups.items()
+
+    def _store(self, raw, key_hash, data, expires, only_new=False):
+        """Запись под блокировкой набора. False, если ключ уже есть
+        (only_new) или значение не помещается в ячейку."""
+        table = self.table
+        index = table.set_of(key_hash)
+        offset = table.find(index, key_hash, raw)
+        if offset is not None and only_new:
+            return False
+        if not table.fits(raw, data):
+            if offset is not None:
+                table.clear_slot(offset)
+            return False
+        if offset is None:
+            offset = table.victim(index)
+        table.write(offset, key_hash, raw, data, expires)
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        raw, key_hash = self._key(key, version)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.table.locked_set(self.table.set_of(key_hash)):
+            return self._store(
+                raw, key_hash, data, self._expires(timeout), only_new=True
+            )
+
+    def get(self, key, default=None, version=None):
+        raw, key_hash = self._key(key, version)
+        index = self.table.set_of(key_hash)
+        with self.table.locked_set(index):
+            offset = self.table.find(index, key_hash, raw)
+            if offset is None:
+                return default
+            return self.table.read(offset)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        raw, key_hash = self._key(key, version)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.table.locked_set(self.table.set_of(key_hash)):
+            self._store(raw, key_hash, data, self._expires(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        raw, key_hash = self._key(key, version)
+        index = self.table.set_of(key_hash)
+        with self.table.locked_set(index):
+            offset = self.table.find(index, key_hash, raw)
+            if offset is None:
+                return False
+            header = list(self.table.read_header(offset))
+            header[1] = self._expires(timeout)
+            SLOT_HEADER.pack_into(self.table.map, offset, *header)
+            return True
+
+    def delete(self, key, version=None):
+        raw, key_hash = self._key(key, version)
+        index = self.table.set_of(key_hash)
+        with self.table.locked_set(index):
+            offset = self.table.find(index, key_hash, raw)
+            if offset is not None:
+                self.table.clear_slot(offset)
+
+    def has_key(self, key, version=None):
+        raw, key_hash = self._key(key, version)
+        index = self.table.set_of(key_hash)
+        with self.table.locked_set(index):
+            return self.table.find(index, key_hash, raw) is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов, в отличие от BaseCache.incr."""
+        raw, key_hash = self._key(key, version)
+        index = self.table.set_of(key_hash)
+        with self.table.locked_set(index):
+            offset = self.table.find(index, key_hash, raw)
+            if offset is None:
+                raise ValueError(f"Key '{key}' not found")
+            expires = self.table.read_header(offset)[1]
+            value = self.table.read(offset) + delta
+            self._store(
+                raw, key_hash, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                expires
+            )
+            return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for index, items in self._group(keys, version):
+            with self.table.locked_set(index):
+                for key, raw, key_hash in items:
+                    offset = self.table.find(index, key_hash, raw)
+                    if offset is not None:
+                        found[key] = self.table.read(offset)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        failed = []
+        for index, items in self._group(data, version):
+            with self.table.locked_set(index):
+                for key, raw, key_hash in items:
+                    value = pickle.dumps(data[key], pickle.HIGHEST_PROTOCOL)
+                    if not self._store(raw, key_hash, value, expires):
+                        failed.append(key)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for index, items in self._group(keys, version):
+            with self.table.locked_set(index):
+                for _, raw, key_hash in items:
+                    offset = self.table.find(index, key_hash, raw)
+                    if offset is not None:
+                        self.table.clear_slot(offset)
+
+    def clear(self):
+        self.table.clear()
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import tempfile
+from time import perf_counter
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.shared import SharedMemoryCache
+
+
+def write_keys(backend, keys):
+    backend.set_many(dict.fromkeys(keys, b'worker'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMemCache, FileBasedCache и SharedMemoryCache: '
+        'время set/get/get_many и видимость записей других процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=500)
+        parser.add_argument(
+            '--value-size', type=int, default=16 * 1024,
+            help='Размер значения в байтах (порядка страницы ленты).'
+        )
+        parser.add_argument('--workers', type=int, default=4)
+
+    def get_backends(self, directory):
+        options = {'OPTIONS': {'MAX_ENTRIES': 100_000}}
+        return {
+            'locmem': LocMemCache('bench', options),
+            'file': FileBasedCache(os.path.join(directory, 'file'), options),
+            'shared': SharedMemoryCache(
+                os.path.join(directory, 'shared'),
+                {'OPTIONS': {'SLOTS': 4096, 'SLOT_SIZE': 64 * 1024}}
+            ),
+        }
+
+    def measure(self, action, count):
+        started = perf_counter()
+        action()
+        return (perf_counter() - started) / count * 1_000_000
+
+    def shared_hits(self, backend, keys, workers):
+        """Доля ключей, записанных воркерами после fork, которую видит
+        родительский процесс."""
+        keys = [f'worker:{key}' for key in keys]
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(
+                target=write_keys, args=(backend, keys[i::workers])
+            )
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return len(backend.get_many(keys)) / len(keys) * 100
+
+    def handle(self, *args, **options):
+        keys = [f'page:{i}' for i in range(options['keys'])]
+        value = os.urandom(options['value_size'])
+        count = len(keys)
+        self.stdout.write(
+            f'{"backend":<8} {"set, мкс":>9} {"get, мкс":>9} '
+            f'{"get_many, мкс":>14} {"видно из воркеров":>18}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, backend in self.get_backends(directory).items():
+                backend.clear()
+                set_us = self.measure(
+                    lambda: [backend.set(key, value) for key in keys], count
+                )
+                get_us = self.measure(
+                    lambda: [backend.get(key) for key in keys], count
+                )
+                get_many_us = self.measure(
+                    lambda: backend.get_many(keys), count
+                )
+                hits = self.shared_hits(backend, keys, options['workers'])
+                self.stdout.write(
+                    f'{name:<8} {set_us:>9.1f} {get_us:>9.1f} '
+                    f'{get_many_us:>14.1f} {hits:>17.0f}%'
+                )
+                backend.clear()
@@ -0,0 +1,121 @@
+"""Отдача загруженных файлов из MEDIA_ROOT.
+
+За фронтовым сервером файл отдаёт он сам: ответ содержит только
+X-Accel-Redirect (nginx) или X-Sendfile (Apache, lighttpd). Без него
+Django отдаёт файл через FileResponse со строгим ETag, условными
+запросами и диапазонами байтов.
+
+Миниатюры, варианты для srcset и картинки с именем по содержимому
+никогда не меняются по тому же пути, поэтому кэшируются браузером
+на год с immutable.
+"""
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def resolve(path):
+    """Абсолютный путь к файлу внутри MEDIA_ROOT или None."""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except (SuspiciousFileOperation, ValueError):
+        return None
+    return full_path if os.path.isfile(full_path) else None
+
+
+def is_immutable(path):
+    return any(
+        re.match(pattern, path)
+        for pattern in settings.MEDIA_IMMUTABLE_PATTERNS
+    )
+
+
+def cache_control(path):
+    if is_immutable(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def make_etag(stat):
+    """Строгий ETag по inode, размеру и времени изменения, как у nginx."""
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """(начало, конец включительно) для одного диапазона; None — отдать
+    весь файл; ValueError — диапазон не пересекается с файлом.
+    Несколько диапазонов сразу не поддерживаются, и тогда отдаётся
+    весь файл, что допускает RFC 7233."""
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match['start'], match['end']
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500: последние 500 байт
+        length = int(end)
+        if not length:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        if start >= size:
+            raise ValueError(header)
+        return None
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    """If-Range с ETag или датой: диапазон отдаётся, только если файл
+    не менялся, иначе — весь файл."""
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and int(mtime) == date
+
+
+def front_server_headers(path, full_path):
+    """Заголовок для передачи файла фронтовому серверу или пустой
+    словарь, если он не настроен."""
+    if settings.MEDIA_ACCEL_REDIRECT:
+        return {
+            'X-Accel-Redirect':
+                settings.MEDIA_ACCEL_REDIRECT + quote(path),
+        }
+    if settings.MEDIA_SENDFILE:
+        return {'X-Sendfile': full_path}
+    return {}
+
+
+def read_range(file, start, end, block_size=64 * 1024):
+    """Читает байты с start по end включительно блоками."""
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(block_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def last_modified(stat):
+    return http_date(stat.st_mtime)
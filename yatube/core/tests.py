@@ -1,5 +1,20 @@
+import multiprocessing
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 
+from .cache.bounded import BoundedCache
+from .cache.shared import SharedMemoryCache
+
+User = get_user_model()
+
+
+def increment(cache, key, times):
+    for _ in range(times):
+        cache.incr(key)
+
 
 class ErrorPageURLTests(TestCase):
     def setUp(self):
@@ -8,3 +23,215 @@ class ErrorPageURLTests(TestCase):
     def test_404_page_correct_template(self):
         response = self.guest_client.get('/fdfds')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SharedMemoryCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def make_cache(self, name='cache', **options):
+        return SharedMemoryCache(
+            os.path.join(self.directory.name, name), {'OPTIONS': options}
+        )
+
+    def test_set_get_delete(self):
+        cache = self.make_cache()
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 2))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertEqual(cache.incr('counter'), 2)
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_expired_entry_is_missing(self):
+        cache = self.make_cache()
+        cache.set('key', 'value', timeout=-1)
+        self.assertIsNone(cache.get('key'))
+        self.assertTrue(cache.add('key', 'value'))
+
+    def test_get_many_and_set_many(self):
+        cache = self.make_cache()
+        data = {f'key{i}': i for i in range(50)}
+        self.assertEqual(cache.set_many(data), [])
+        self.assertEqual(cache.get_many(list(data) + ['missing']), data)
+        cache.delete_many(data)
+        self.assertEqual(cache.get_many(data), {})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = self.make_cache(SLOTS=2, WAYS=2)
+        cache.set('first', 1)
+        cache.set('second', 2)
+        cache.get('first')
+        cache.set('third', 3)
+        self.assertEqual(
+            cache.get_many(['first', 'second', 'third']),
+            {'first': 1, 'third': 3}
+        )
+
+    def test_value_larger_than_slot_is_not_stored(self):
+        cache = self.make_cache(SLOT_SIZE=256)
+        cache.set('key', 'small')
+        self.assertEqual(cache.set_many({'key': 'x' * 1024}), ['key'])
+        self.assertIsNone(cache.get('key'))
+
+    def test_entries_are_shared_between_processes(self):
+        cache = self.make_cache()
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=cache.set, args=('child', 42))
+        process.start()
+        process.join()
+        self.assertEqual(cache.get('child'), 42)
+
+    def test_concurrent_incr_from_processes(self):
+        cache = self.make_cache()
+        cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=increment, args=(cache, 'counter', 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(cache.get('counter'), 200)
+
+
+class BoundedCacheTests(TestCase):
+    def make_cache(self, name, **options):
+        return BoundedCache(name, {'OPTIONS': options})
+
+    def test_least_recently_used_entry_is_evicted_by_size(self):
+        cache = self.make_cache('lru', MAX_BYTES=300)
+        for key in ('first', 'second'):
+            cache.set(key, 'x' * 100)
+        cache.get('first')
+        cache.set('third', 'x' * 100)
+        self.assertEqual(
+            set(cache.get_many(['first', 'second', 'third'])),
+            {'first', 'third'}
+        )
+        stats = cache.stats()['default']
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], 300)
+
+    def test_namespace_quota_protects_other_namespaces(self):
+        cache = self.make_cache(
+            'quota',
+            NAMESPACES={
+                'pages': {'PREFIXES': ['page.'], 'MAX_BYTES': 500},
+                'fragments': {'PREFIXES': ['card.'], 'MAX_BYTES': 500},
+            }
+        )
+        cache.set('card.1', 'card')
+        for i in range(100):
+            cache.set(f'page.{i}', 'x' * 100)
+        self.assertEqual(cache.get('card.1'), 'card')
+        stats = cache.stats()
+        self.assertGreater(stats['pages']['evictions'], 90)
+        self.assertEqual(stats['fragments']['evictions'], 0)
+        self.assertEqual(stats['fragments']['hits'], 1)
+
+    def test_value_over_quota_is_rejected(self):
+        cache = self.make_cache('rejected', MAX_BYTES=100)
+        cache.set('key', 'x' * 1000)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['default']['rejected'], 1)
+        self.assertEqual(cache.stats()['default']['misses'], 1)
+
+
+class CacheStatsViewTests(TestCase):
+    def test_stats_only_for_staff(self):
+        user = User.objects.create_user(username='staff', is_staff=True)
+        client = Client()
+        self.assertEqual(client.get('/cache/stats/').status_code, 302)
+        client.force_login(user)
+        response = client.get('/cache/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('pages', response.json())
+
+
+class MediaServingTests(TestCase):
+    CONTENT = bytes(range(256)) * 4
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = self.settings(MEDIA_ROOT=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(directory.name, 'cache'))
+        for name in ('file.bin', 'cache/thumb.bin'):
+            with open(os.path.join(directory.name, name), 'wb') as file:
+                file.write(self.CONTENT)
+        self.client = Client()
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file_with_validators(self):
+        response = self.client.get('/media/file.bin')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), self.CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(self.CONTENT)))
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_conditional_requests_get_304(self):
+        response = self.client.get('/media/file.bin')
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ):
+            with self.subTest(headers=headers):
+                cached = self.client.get('/media/file.bin', **headers)
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_byte_ranges(self):
+        for header, expected, content_range in (
+            ('bytes=0-9', self.CONTENT[:10], 'bytes 0-9/1024'),
+            ('bytes=1000-', self.CONTENT[1000:], 'bytes 1000-1023/1024'),
+            ('bytes=-4', self.CONTENT[-4:], 'bytes 1020-1023/1024'),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/media/file.bin', HTTP_RANGE=header
+                )
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(self.content(response), expected)
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        response = self.client.get('/media/file.bin', HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        response = self.client.get(
+            '/media/file.bin', HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_immutable_paths_cached_for_a_year(self):
+        response = self.client.get('/media/cache/thumb.bin')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_missing_and_outside_paths_are_404(self):
+        for path in ('/media/missing.bin', '/media/../settings.py',
+                     '/media/cache/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_front_server_transfers_file(self):
+        with self.settings(MEDIA_ACCEL_REDIRECT='/protected/'):
+            response = self.client.get('/media/cache/thumb.bin')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected/cache/thumb.bin')
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_SENDFILE=True):
+            response = self.client.get('/media/file.bin')
+        self.assertTrue(response['X-Sendfile'].endswith('file.bin'))
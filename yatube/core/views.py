@@ -1,4 +1,15 @@
+import mimetypes
+import os
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import (FileResponse, Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+from . import media
 
 
 def page_not_found(request, exception):
@@ -15,3 +26,74 @@ def forbidden_server(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@staff_member_required
+def cache_stats(request):
+    """Счётчики кэша по пространствам, если бэкенд их ведёт."""
+    stats = cache.stats() if hasattr(cache, 'stats') else {}
+    return JsonResponse(stats)
+
+
+@require_safe
+def serve_media(request, path):
+    """Файл из MEDIA_ROOT: через фронтовый сервер, если он настроен,
+    иначе сам с ETag, Last-Modified и Range."""
+    full_path = media.resolve(path)
+    if full_path is None:
+        raise Http404('Файл не найден')
+    stat = os.stat(full_path)
+    etag = media.make_etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': media.last_modified(stat),
+        'Cache-Control': media.cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = _media_response(request, path, full_path, stat)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _media_response(request, path, full_path, stat):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    front = media.front_server_headers(path, full_path)
+    if front:
+        # Диапазоны и проверки повторит фронтовый сервер
+        response = HttpResponse(content_type=content_type)
+        for header, value in front.items():
+            response[header] = value
+        return response
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and media.if_range_matches(
+        request, media.make_etag(stat), stat.st_mtime
+    ):
+        try:
+            byte_range = media.parse_range(header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+        response['Content-Length'] = stat.st_size
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            media.read_range(open(full_path, 'rb'), start, end),
+            status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
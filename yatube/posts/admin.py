@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Group, Post
+from .search import filter_matching
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -25,6 +26,10 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date', )
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE '%...%'."""
+        return filter_matching(queryset, search_term), False
+
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,148 @@
+"""Read-only JSON API лент и постов.
+
+Строки берутся через values() без сборки объектов моделей, страницы
+выбираются курсором (pub_date, id) параметром ?cursor=. Ответы несут
+ETag и Last-Modified по поколениям кэша, поэтому повторный запрос
+неизменившейся страницы получает 304 без обращения к базе.
+"""
+from django.conf import settings
+from django.http import Http404, JsonResponse
+
+from .caching import (AUTHOR_SCOPE, FEEDS_SCOPE, GROUP_SCOPE, INDEX_SCOPE,
+                      POST_SCOPE, cache_feed, check_conditions,
+                      conditional_feed, set_validators)
+from .models import Comment, Follow, Post
+from .objects import get_cached_or_404, group_cache, user_cache
+from .timeline import Timeline
+from .utils import paginate_comments, paginate_cursor
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author__username', 'group__slug', 'image',
+    'image_width', 'image_height', 'image_color', 'comments_count',
+)
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+
+image_storage = Post._meta.get_field('image').storage
+
+
+def post_rows():
+    return Post.objects.values(*POST_FIELDS)
+
+
+def serialize_post(row):
+    image = None
+    if row['image']:
+        image = {
+            'url': image_storage.url(row['image']),
+            'width': row['image_width'],
+            'height': row['image_height'],
+            'color': row['image_color'],
+        }
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'].isoformat(),
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': image,
+        'comments_count': row['comments_count'],
+    }
+
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'created': row['created'].isoformat(),
+        'author': row['author__username'],
+    }
+
+
+def json_response(data, **kwargs):
+    return JsonResponse(
+        data, json_dumps_params={'ensure_ascii': False}, **kwargs
+    )
+
+
+def feed_response(request, post_list):
+    page = paginate_cursor(
+        post_list, request.GET.get('cursor'), settings.POSTS_PER_PAGE
+    )
+    return json_response({
+        'results': [serialize_post(row) for row in page],
+        'newer_cursor': page.newer_cursor,
+        'older_cursor': page.older_cursor,
+    })
+
+
+class TimelineRows(Timeline):
+    """Лента подписок, собранная из строк values()."""
+
+    @staticmethod
+    def hydrate(items):
+        items = list(items)
+        rows = {
+            row['id']: row
+            for row in post_rows().filter(pk__in=[pk for _, pk in items])
+        }
+        return [rows[pk] for _, pk in items if pk in rows]
+
+
+@conditional_feed(INDEX_SCOPE)
+@cache_feed(INDEX_SCOPE, per_user=False)
+def index(request):
+    return feed_response(request, post_rows())
+
+
+@conditional_feed(GROUP_SCOPE.format('{slug}'))
+@cache_feed(GROUP_SCOPE.format('{slug}'), per_user=False)
+def group_posts(request, slug):
+    group = get_cached_or_404(group_cache, slug=slug)
+    return feed_response(request, post_rows().filter(group_id=group.pk))
+
+
+@conditional_feed(AUTHOR_SCOPE.format('{username}'))
+@cache_feed(AUTHOR_SCOPE.format('{username}'), per_user=False)
+def profile(request, username):
+    author = get_cached_or_404(user_cache, username=username)
+    return feed_response(request, post_rows().filter(author_id=author.pk))
+
+
+def follow_index(request):
+    """Лента подписок меняется вместе с лентами авторов, поэтому её
+    валидаторы — поколения этих авторов. Last-Modified не отдаётся:
+    после отписки область автора выпадает из списка и время изменения
+    ушло бы назад."""
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Требуется вход.'}, status=401)
+    usernames = Follow.objects.filter(user=request.user).values_list(
+        'author__username', flat=True
+    )
+    etag, last_modified, response = check_conditions(
+        request,
+        [FEEDS_SCOPE] + [AUTHOR_SCOPE.format(name) for name in usernames],
+        with_last_modified=False
+    )
+    if response is not None:
+        return response
+    return set_validators(
+        feed_response(request, TimelineRows(request.user)),
+        etag, last_modified
+    )
+
+
+@conditional_feed(POST_SCOPE.format('{post_id}'))
+def post_detail(request, post_id):
+    """Пост и срез комментариев после ?cursor=, старые первыми."""
+    row = post_rows().filter(pk=post_id).first()
+    if row is None:
+        raise Http404('Пост не найден')
+    comments, comments_cursor = paginate_comments(
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS),
+        request.GET.get('cursor')
+    )
+    return json_response({
+        **serialize_post(row),
+        'comments': [serialize_comment(comment) for comment in comments],
+        'comments_cursor': comments_cursor,
+    })
@@ -0,0 +1,418 @@
+"""Кэш страниц лент с инвалидацией по поколениям.
+
+У каждой области (главная, группа, автор) есть счётчик поколения.
+Он входит в ключ кэша страницы, а сигналы моделей увеличивают его
+при изменениях. Поэтому страницы можно хранить часами: после
+изменения старые ключи просто перестают запрашиваться.
+
+Устаревшую страницу пересобирает один запрос, остальные в это время
+получают старую копию (stale-while-revalidate). Это касается и смены
+поколения: по адресу помнится последняя собранная копия, и её отдают,
+пока собирается новая.
+
+Вместе с поколением хранится время последнего изменения области. Из
+них получаются ETag и Last-Modified, так что ответ 304 отдаётся без
+обращения к базе.
+"""
+import copy
+import math
+import random
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (get_cache_key, get_conditional_response,
+                                has_vary_header, learn_cache_key, quote_etag)
+from django.utils.http import http_date
+
+GENERATION_KEY = 'generation:{}'
+MODIFIED_KEY = 'generation:{}:modified'
+
+# Входит в ключ каждой ленты: меняется вместе с группами и
+# пользователями, которые видны на карточках постов.
+FEEDS_SCOPE = 'feeds'
+INDEX_SCOPE = 'index'
+GROUP_SCOPE = 'group:{}'
+AUTHOR_SCOPE = 'author:{}'
+POST_SCOPE = 'post:{}'
+TAG_SCOPE = 'tag:{}'
+
+
+def new_generation():
+    """Начальное значение не повторяет прежние, если счётчик вытеснен
+    из кэша."""
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: new_generation() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def get_validators(scopes):
+    """Поколения областей и время последнего изменения любой из них
+    одним обращением к кэшу. Вытесненное время считается текущим."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    modified_keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys + modified_keys)
+    now = time.time()
+    missing = {key: new_generation() for key in keys if key not in found}
+    missing.update(
+        (key, now) for key in modified_keys if key not in found
+    )
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return (
+        [found[key] for key in keys],
+        max(found[key] for key in modified_keys)
+    )
+
+
+def bump_generation(*scopes):
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_generation(), None)
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): time.time() for scope in scopes}, None
+    )
+
+
+LOCK_SUFFIX = '.lock'
+LATEST_SUFFIX = '.latest'
+WAIT_INTERVAL = 0.05
+
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def _count(name):
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+def get_cache_metrics():
+    """hits, misses, coalesced (ответ без пересборки, пока страницу
+    собирает другой запрос), stale_rebuilds, early_refreshes."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def reset_cache_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def _is_cacheable(request, response):
+    """Те же условия, что у UpdateCacheMiddleware."""
+    if response.streaming or response.status_code not in (200, 304):
+        return False
+    if (
+        not request.COOKIES and response.cookies
+        and has_vary_header(response, 'Cookie')
+    ):
+        return False
+    return 'private' not in response.get('Cache-Control', ())
+
+
+def _refresh_early(now, fresh_until, cost, beta):
+    """Вероятностное досрочное обновление (XFetch): чем ближе срок и
+    дороже пересборка, тем вероятнее обновить заранее."""
+    if not beta:
+        return False
+    return now - cost * beta * math.log(1 - random.random()) >= fresh_until
+
+
+def normalize_request(request, params=None):
+    """Копия запроса для построения ключа кэша: в строке запроса
+    остаются только params в постоянном порядке, поэтому мусорные
+    параметры (?utm_source=..., ?_=...) не плодят записи."""
+    params = settings.CACHE_QUERY_PARAMS if params is None else params
+    query = sorted(
+        (name, request.GET[name]) for name in request.GET if name in params
+    )
+    keyed = copy.copy(request)
+    keyed.META = {**request.META, 'QUERY_STRING': urlencode(query)}
+    return keyed
+
+
+def _url_key(request, key_prefix, suffix):
+    url = md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'{key_prefix}.{url}{suffix}'
+
+
+class CoalescedCachePage:
+    """Замена cache_page, защищённая от одновременной пересборки.
+
+    Запись живёт timeout + stale_timeout секунд. После timeout её
+    пересобирает тот, кто первым взял блокировку, остальные получают
+    старую копию. Промах после смены key_prefix тоже не холодный: по
+    адресу и latest_prefix (префиксу без поколений) помнится префикс
+    последней сборки, и её копию отдают, пока собирается новая. Ждут
+    до lock_timeout, только если копии ещё не было.
+    early_refresh — коэффициент досрочного обновления, 0 отключает.
+    per_user — страница зависит от читателя (шапка, кнопки подписки):
+    у каждого пользователя свои записи, анонимы делят одну. Vary: Cookie
+    сессия добавляет уже после декоратора, поэтому на него полагаться
+    нельзя. Заголовки ответа для браузера не меняются.
+    """
+
+    def __init__(self, timeout, key_prefix=None, stale_timeout=None,
+                 early_refresh=None, lock_timeout=None, per_user=False,
+                 latest_prefix=None):
+        self.timeout = timeout
+        self.per_user = per_user
+        self.key_prefix = (
+            settings.CACHE_MIDDLEWARE_KEY_PREFIX if key_prefix is None
+            else key_prefix
+        )
+        self.latest_prefix = (
+            self.key_prefix if latest_prefix is None else latest_prefix
+        )
+        self.stale_timeout = (
+            settings.FEED_CACHE_STALE_TIMEOUT if stale_timeout is None
+            else stale_timeout
+        )
+        self.early_refresh = (
+            settings.FEED_CACHE_EARLY_REFRESH if early_refresh is None
+            else early_refresh
+        )
+        self.lock_timeout = (
+            settings.FEED_CACHE_LOCK_TIMEOUT if lock_timeout is None
+            else lock_timeout
+        )
+
+    def __call__(self, view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            return self.serve(view, request, args, kwargs)
+        return wrapper
+
+    def prefix_for(self, request, key_prefix=None):
+        key_prefix = self.key_prefix if key_prefix is None else key_prefix
+        if not self.per_user:
+            return key_prefix
+        user = getattr(request, 'user', None)
+        reader = user.pk if user is not None and user.is_authenticated else 0
+        return f'{key_prefix}.reader{reader}'
+
+    def latest_key(self, request):
+        return _url_key(
+            normalize_request(request),
+            self.prefix_for(request, self.latest_prefix), LATEST_SUFFIX
+        )
+
+    def get_entry(self, request, prefix=None):
+        cache_key = get_cache_key(
+            normalize_request(request), prefix or self.prefix_for(request),
+            'GET', cache
+        )
+        entry = cache.get(cache_key) if cache_key else None
+        return cache_key, entry
+
+    def get_latest(self, request):
+        """Последняя собранная копия страницы с другим key_prefix.
+        Помечена stale: валидаторы нового поколения ей не подходят."""
+        prefix = cache.get(self.latest_key(request))
+        if prefix is None or prefix == self.prefix_for(request):
+            return None
+        entry = self.get_entry(request, prefix)[1]
+        if entry is None:
+            return None
+        response = entry[0]
+        response.stale = True
+        return response
+
+    def serve(self, view, request, args, kwargs):
+        cache_key, entry = self.get_entry(request)
+        if entry is None:
+            return self.serve_miss(view, request, args, kwargs, cache_key)
+        response, fresh_until, cost = entry
+        now = time.time()
+        if now < fresh_until and not _refresh_early(
+            now, fresh_until, cost, self.early_refresh
+        ):
+            _count('hits')
+            return response
+        lock_key = cache_key + LOCK_SUFFIX
+        if not cache.add(lock_key, 1, self.lock_timeout):
+            _count('coalesced')
+            return response
+        _count('early_refreshes' if now < fresh_until else 'stale_rebuilds')
+        return self.rebuild(view, request, args, kwargs, lock_key)
+
+    def serve_miss(self, view, request, args, kwargs, cache_key):
+        lock_key = (
+            cache_key + LOCK_SUFFIX if cache_key
+            else _url_key(
+                normalize_request(request), self.prefix_for(request),
+                LOCK_SUFFIX
+            )
+        )
+        if cache.add(lock_key, 1, self.lock_timeout):
+            _count('misses')
+            return self.rebuild(view, request, args, kwargs, lock_key)
+        response = self.get_latest(request) or self.wait_for_entry(request)
+        if response is not None:
+            _count('coalesced')
+            return response
+        _count('misses')
+        return self.rebuild(view, request, args, kwargs, None)
+
+    def wait_for_entry(self, request):
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            entry = self.get_entry(request)[1]
+            if entry is not None:
+                return entry[0]
+        return None
+
+    def rebuild(self, view, request, args, kwargs, lock_key):
+        lifetime = self.timeout + self.stale_timeout
+        try:
+            started = time.time()
+            response = view(request, *args, **kwargs)
+            if _is_cacheable(request, response):
+                cost = time.time() - started
+                cache_key = learn_cache_key(
+                    normalize_request(request), response, lifetime,
+                    self.prefix_for(request), cache=cache
+                )
+                cache.set_many({
+                    cache_key: (response, time.time() + self.timeout, cost),
+                    self.latest_key(request): self.prefix_for(request),
+                }, lifetime)
+            return response
+        finally:
+            if lock_key is not None:
+                cache.delete(lock_key)
+
+
+def coalesced_cache_page(timeout, *, key_prefix=None, stale_timeout=None,
+                         early_refresh=None, lock_timeout=None,
+                         per_user=False, latest_prefix=None):
+    return CoalescedCachePage(
+        timeout, key_prefix, stale_timeout, early_refresh, lock_timeout,
+        per_user, latest_prefix
+    )
+
+
+def cache_feed(*scopes, timeout=None, per_user=True):
+    """Кэш страницы, у которого ключ зависит от поколений областей.
+
+    Области — шаблоны строк, их заполняют именованные аргументы
+    представления: cache_feed(GROUP_SCOPE.format('{slug}')).
+    per_user=False — для ответов, одинаковых для всех читателей.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            generations = get_generations(
+                [FEEDS_SCOPE]
+                + [scope.format(**kwargs) for scope in scopes]
+            )
+            key_prefix = 'feed.' + '.'.join(map(str, generations))
+            cached_view = coalesced_cache_page(
+                timeout or settings.FEED_CACHE_TIMEOUT,
+                key_prefix=key_prefix,
+                per_user=per_user,
+                latest_prefix='feed'
+            )(view)
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def check_conditions(request, scopes, *parts, with_last_modified=True):
+    """ETag, Last-Modified и готовый ответ 304/412 или None.
+
+    ETag строится из поколений областей, адреса запроса и parts —
+    всего, от чего ещё зависит ответ. Если ответ зависит от того, чего
+    нет во времени изменения (например, от читателя), Last-Modified
+    не годится: with_last_modified=False, и он равен None.
+    """
+    generations, modified = get_validators(scopes)
+    raw = '|'.join(map(str, [*generations, request.get_full_path(), *parts]))
+    etag = quote_etag(md5(raw.encode()).hexdigest())
+    last_modified = int(modified) if with_last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return etag, last_modified, response
+
+
+def set_validators(response, etag, last_modified):
+    """Старой копии страницы, отданной на время пересборки, валидаторы
+    не ставятся: иначе браузер держал бы её до следующего изменения."""
+    if getattr(response, 'stale', False):
+        return response
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is None:
+            del response['Last-Modified']
+        else:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional_feed(*scopes, per_user=False):
+    """Условный GET по поколениям областей: при совпадении валидаторов
+    представление не вызывается. Области задаются как в cache_feed
+    или функцией от именованных аргументов представления, которая
+    возвращает имя области или None.
+
+    per_user — страница зависит от читателя (шапка, кнопки, токен CSRF
+    в формах), поэтому в ETag входят пользователь и cookie CSRF, а
+    Last-Modified не отдаётся: по нему одному вошедший читатель получил
+    бы 304 на анонимную страницу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            parts = []
+            if per_user:
+                parts = [
+                    request.user.pk,
+                    request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+                ]
+            names = [FEEDS_SCOPE]
+            for scope in scopes:
+                name = (
+                    scope(**kwargs) if callable(scope)
+                    else scope.format(**kwargs)
+                )
+                if name is not None:
+                    names.append(name)
+            etag, last_modified, response = check_conditions(
+                request,
+                names,
+                *parts,
+                with_last_modified=not per_user
+            )
+            if response is not None:
+                return response
+            return set_validators(
+                view(request, *args, **kwargs), etag, last_modified
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,77 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Сигналы меняют их атомарными F()-обновлениями, а reconcile_* заново
+считают значения по таблицам пачками, если счётчики разошлись
+(массовые операции в обход сигналов, ручные правки в базе).
+Разошедшийся счётчик не уходит ниже нуля: поля беззнаковые.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, Profile, User
+
+
+def shift_profile(user_id, **deltas):
+    """Профиль без строки пропускается: его досчитает reconcile."""
+    Profile.objects.filter(user_id=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def shift_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0)
+    )
+
+
+def _count_of(model, field, outer_field):
+    """Подзапрос: сколько строк model ссылаются полем field на
+    outer_field внешней строки."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer_field)}).order_by(
+        ).values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def _pk_ranges(queryset, batch_size):
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    batch = []
+    for pk in pks.iterator():
+        batch.append(pk)
+        if len(batch) == batch_size:
+            yield batch[0], batch[-1]
+            batch = []
+    if batch:
+        yield batch[0], batch[-1]
+
+
+def reconcile_posts(batch_size=1000):
+    updated = 0
+    for first, last in _pk_ranges(Post.objects.all(), batch_size):
+        updated += Post.objects.filter(pk__range=(first, last)).update(
+            comments_count=_count_of(Comment, 'post', 'pk')
+        )
+    return updated
+
+
+def reconcile_profiles(batch_size=1000):
+    missing = User.objects.filter(profile__isnull=True)
+    for first, last in _pk_ranges(missing, batch_size):
+        Profile.objects.bulk_create(
+            [
+                Profile(user_id=pk)
+                for pk in missing.filter(
+                    pk__range=(first, last)
+                ).values_list('pk', flat=True)
+            ],
+            ignore_conflicts=True
+        )
+    updated = 0
+    for first, last in _pk_ranges(Profile.objects.all(), batch_size):
+        updated += Profile.objects.filter(pk__range=(first, last)).update(
+            posts_count=_count_of(Post, 'author', 'user_id'),
+            followers_count=_count_of(Follow, 'author', 'user_id'),
+            following_count=_count_of(Follow, 'user', 'user_id'),
+        )
+    return updated
@@ -0,0 +1,227 @@
+"""Лента подписок, материализованная при записи (fan-out on write).
+
+Каждый новый пост раскладывается по лентам подписчиков автора,
+подписка дозаполняет ленту постами автора, отписка их убирает.
+Чтение ленты — один проход по индексу (user, -pub_date).
+
+Посты популярных авторов сюда не попадают: их лента читается
+из кэша при чтении (см. posts.timeline). Когда автор опускается ниже
+порога, его посты pull-периода раскладываются задним числом в фоне.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import FeedEntry, Follow, Post, Profile
+from .timeline import get_pull_authors, invalidate_pull_flag, is_pull_author
+
+RETURN_LOCK_KEY = 'feed:return-to-push:{}'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _bulk_insert(entries, batch_size):
+    created = 0
+    for batch in batched(entries, batch_size):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        created += len(batch)
+    return created
+
+
+def fan_out_post(post, batch_size=None):
+    """Кладёт пост в ленты всех подписчиков его автора."""
+    if is_pull_author(post.author_id):
+        return 0
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    return _bulk_insert(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ),
+        batch_size or settings.FEED_BATCH_SIZE
+    )
+
+
+def backfill_follow(user_id, author_id, batch_size=None):
+    """Дозаполняет ленту читателя постами автора, на которого он
+    подписался."""
+    if is_pull_author(author_id):
+        return 0
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    ).iterator()
+    return _bulk_insert(
+        (
+            FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ),
+        batch_size or settings.FEED_BATCH_SIZE
+    )
+
+
+def push_limit():
+    """Ниже этого числа подписчиков автор возвращается в push."""
+    return settings.TIMELINE_PULL_THRESHOLD * settings.TIMELINE_PUSH_RATIO
+
+
+def _fan_out_recent(author_id, posts, batch_size):
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).iterator()
+    return _bulk_insert(
+        (
+            FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id in follower_ids
+            for pk, pub_date in posts
+        ),
+        batch_size or settings.FEED_BATCH_SIZE
+    )
+
+
+def return_to_push(author_id, batch_size=None):
+    """Возвращает автора из pull в push.
+
+    Посты pull-периода не попадали в FeedEntry и пропали бы из лент,
+    как только автор перестал подмешиваться из кэша. Раскладывается
+    TIMELINE_AUTHOR_LENGTH постов — столько читатели и видели из кэша.
+    Флаг снимается после раскладки, а посты, вышедшие за это время,
+    дораскладываются следом; повторы ленты отбрасывают при слиянии.
+    """
+    started = timezone.now()
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')
+    created = _fan_out_recent(
+        author_id, list(posts[:settings.TIMELINE_AUTHOR_LENGTH]), batch_size
+    )
+    switched = Profile.objects.filter(
+        user_id=author_id, pull_timeline=True,
+        followers_count__lt=push_limit()
+    ).update(pull_timeline=False)
+    invalidate_pull_flag(author_id)
+    if switched:
+        created += _fan_out_recent(
+            author_id, list(posts.filter(pub_date__gte=started)), batch_size
+        )
+    return created
+
+
+def _return_to_push(author_id):
+    try:
+        return_to_push(author_id)
+    except Exception:
+        logger.exception(
+            'Не удалось вернуть автора %s в режим push', author_id
+        )
+    finally:
+        cache.delete(RETURN_LOCK_KEY.format(author_id))
+
+
+def _run(author_id):
+    try:
+        _return_to_push(author_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.FEED_WORKERS, thread_name_prefix='feed'
+            )
+        return _executor
+
+
+def use_pool():
+    """Как и миниатюры, с SQLite в памяти раскладка идёт сразу."""
+    if not settings.FEED_WORKERS:
+        return False
+    return not (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def submit(author_id):
+    if not cache.add(
+        RETURN_LOCK_KEY.format(author_id), True,
+        settings.FEED_RETURN_LOCK_TIMEOUT
+    ):
+        return
+    if use_pool():
+        get_executor().submit(_run, author_id)
+    else:
+        _return_to_push(author_id)
+
+
+def update_mode(author_id):
+    """Переключает режим автора после подписки или отписки.
+
+    В pull автор уходит сразу, как только подписчиков стало не меньше
+    порога: это одно обновление флага. Обратно — только ниже
+    push_limit() и в фоне после фиксации транзакции, потому что
+    раскладка постов по лентам всех подписчиков может занять миллионы
+    строк.
+    """
+    threshold = settings.TIMELINE_PULL_THRESHOLD
+    if Profile.objects.filter(
+        user_id=author_id, pull_timeline=False,
+        followers_count__gte=threshold
+    ).update(pull_timeline=True):
+        invalidate_pull_flag(author_id)
+    elif Profile.objects.filter(
+        user_id=author_id, pull_timeline=True,
+        followers_count__lt=push_limit()
+    ).exists():
+        transaction.on_commit(partial(submit, author_id))
+
+
+def prune_follow(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    return FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()[0]
+
+
+def rebuild_feed(user_id, batch_size=None):
+    """Пересобирает ленту читателя с нуля. Идемпотентно."""
+    author_ids = list(
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )
+    )
+    push_ids = set(author_ids) - get_pull_authors(author_ids)
+    posts = Post.objects.filter(
+        author_id__in=push_ids
+    ).order_by().values_list('pk', 'pub_date').iterator()
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        return _bulk_insert(
+            (
+                FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for pk, pub_date in posts
+            ),
+            batch_size or settings.FEED_BATCH_SIZE
+        )
@@ -0,0 +1,122 @@
+"""RSS и Atom лент: главной, группы и автора.
+
+Ленты кэшируются и отвечают на условный GET по тем же поколениям,
+что и HTML-страницы, поэтому опрос неизменившейся ленты обходится
+без обращения к базе. Число записей ограничено SYNDICATION_ITEMS.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.template.defaultfilters import linebreaksbr, truncatechars
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+
+from .caching import (AUTHOR_SCOPE, GROUP_SCOPE, INDEX_SCOPE, cache_feed,
+                      conditional_feed)
+from .models import Post
+from .objects import get_cached_or_404, group_cache, user_cache
+
+ITEM_FIELDS = (
+    'text', 'pub_date', 'updated', 'author__username',
+    'author__first_name', 'author__last_name',
+)
+TITLE_LENGTH = 60
+
+
+def feed_posts(**lookup):
+    return Post.objects.filter(**lookup).select_related('author').only(
+        *ITEM_FIELDS
+    ).order_by('-pub_date', '-pk')[:settings.SYNDICATION_ITEMS]
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    link = reverse_lazy('posts:main')
+    description = 'Новые записи всех авторов'
+
+    def items(self):
+        return feed_posts()
+
+    def item_title(self, post):
+        return truncatechars(post.text, TITLE_LENGTH)
+
+    def item_description(self, post):
+        return linebreaksbr(post.text)
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_cached_or_404(group_cache, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group', args=[group.slug])
+
+    def description(self, group):
+        return group.description
+
+    def items(self, group):
+        return feed_posts(group_id=group.pk)
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_cached_or_404(user_cache, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def items(self, author):
+        return feed_posts(author_id=author.pk)
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj=None):
+        return self._get_dynamic_attr('description', obj)
+
+
+class LatestPostsAtomFeed(AtomMixin, LatestPostsFeed):
+    pass
+
+
+class GroupPostsAtomFeed(AtomMixin, GroupPostsFeed):
+    pass
+
+
+class AuthorPostsAtomFeed(AtomMixin, AuthorPostsFeed):
+    pass
+
+
+def cached(feed, scope):
+    return conditional_feed(scope)(cache_feed(scope, per_user=False)(feed))
+
+
+latest_rss = cached(LatestPostsFeed(), INDEX_SCOPE)
+latest_atom = cached(LatestPostsAtomFeed(), INDEX_SCOPE)
+group_rss = cached(GroupPostsFeed(), GROUP_SCOPE.format('{slug}'))
+group_atom = cached(GroupPostsAtomFeed(), GROUP_SCOPE.format('{slug}'))
+author_rss = cached(AuthorPostsFeed(), AUTHOR_SCOPE.format('{username}'))
+author_atom = cached(
+    AuthorPostsAtomFeed(), AUTHOR_SCOPE.format('{username}')
+)
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.exceptions import ValidationError
 
 from .models import Comment, Post
+from .uploads import IMAGE_FIELD
 
 
 class PostForm(forms.ModelForm):
@@ -17,6 +19,20 @@ class PostForm(forms.ModelForm):
             'image'
         )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл, отброшенный ImageUploadHandler, не доходит до поля
+        image = self.files.get(IMAGE_FIELD)
+        self.upload_error = getattr(image, 'upload_error', None)
+        if self.upload_error is not None:
+            self.files = self.files.copy()
+            del self.files[IMAGE_FIELD]
+
+    def clean_image(self):
+        if self.upload_error is not None:
+            raise ValidationError(self.upload_error, code='upload')
+        return self.cleaned_data['image']
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,58 @@
+"""Кэш отрисованных карточек постов.
+
+Ключ карточки состоит из шаблона, хэша его исходника, id поста и
+времени его изменения (Post.updated). Правка поста меняет updated сама,
+а изменения автора и группы сдвигают updated их постов в сигналах.
+Поэтому удалять устаревшие карточки не нужно: их ключи больше не
+запрашиваются.
+"""
+from functools import lru_cache
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from .thumbnails import prefetch_thumbnails
+
+CARD_KEY = 'card.{template}.{version}.{pk}.{updated}'
+# Размер миниатюры из POST_THUMBNAILS, который выводят карточки
+CARD_THUMBNAIL = 'card'
+
+
+@lru_cache(maxsize=None)
+def get_template_version(template_name):
+    """Хэш исходника шаблона: правка разметки сбрасывает карточки."""
+    source = get_template(template_name).template.source
+    return md5(source.encode()).hexdigest()[:8]
+
+
+def card_key(template_name, post):
+    return CARD_KEY.format(
+        template=template_name,
+        version=get_template_version(template_name),
+        pk=post.pk,
+        updated=f'{post.updated.timestamp():.6f}',
+    )
+
+
+def render_cards(posts, template_name):
+    """HTML карточек в порядке posts: найденные одним get_many,
+    остальные отрисовываются с заранее загруженными миниатюрами и
+    сохраняются одним set_many."""
+    posts = list(posts)
+    keys = [card_key(template_name, post) for post in posts]
+    found = cache.get_many(keys)
+    misses = [
+        (key, post) for key, post in zip(keys, posts) if key not in found
+    ]
+    prefetch_thumbnails([post for _, post in misses], CARD_THUMBNAIL)
+    missing = {
+        key: render_to_string(template_name, {'post': post})
+        for key, post in misses
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        found.update(missing)
+    return [mark_safe(found[key]) for key in keys]
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.caching import FEEDS_SCOPE, POST_SCOPE, bump_generation
+from posts.metadata import METADATA_FIELDS, extract_metadata
+from posts.models import Post
+from posts.objects import post_cache
+
+
+def read_metadata(post):
+    try:
+        with post.image.open():
+            return post, extract_metadata(post.image.file)
+    except Exception as error:
+        return post, error
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, вес, основной цвет и заглушку картинок '
+        'у постов, загруженных до их извлечения. Посты обновляются '
+        'пачками через bulk_update.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересчитать и у постов, где сведения уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('pk', 'image')
+        if not options['force']:
+            posts = posts.filter(image_width__isnull=True)
+        updated = failed = 0
+        last_pk = 0
+        with ThreadPoolExecutor(options['workers']) as executor:
+            while True:
+                batch = list(posts.filter(pk__gt=last_pk).order_by('pk')[
+                    :options['batch_size']
+                ])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                changed = []
+                for post, result in executor.map(read_metadata, batch):
+                    if isinstance(result, Exception):
+                        failed += 1
+                        self.stderr.write(f'Пост {post.pk}: {result}')
+                        continue
+                    for field, value in result.items():
+                        setattr(post, field, value)
+                    # Новый updated обновляет кэш карточек
+                    post.updated = timezone.now()
+                    changed.append(post)
+                Post.objects.bulk_update(
+                    changed, [*METADATA_FIELDS, 'updated']
+                )
+                post_cache.invalidate(*(post.pk for post in changed))
+                bump_generation(
+                    *(POST_SCOPE.format(post.pk) for post in changed)
+                )
+                updated += len(changed)
+        bump_generation(FEEDS_SCOPE)
+        self.stdout.write(
+            f'Обновлено постов: {updated}, с ошибками: {failed}'
+        )
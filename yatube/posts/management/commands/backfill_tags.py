@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.caching import TAG_SCOPE, bump_generation
+from posts.feed import batched
+from posts.models import Post, PostTag
+from posts.tags import extract_tags, get_tag_ids
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет индекс тегов по текстам существующих постов. '
+        'Посты читаются через iterator() и обрабатываются пачками, '
+        'каждая в своей транзакции; повторный запуск безопасен.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def index_batch(self, posts):
+        found = {
+            (pk, pub_date): extract_tags(text) for pk, text, pub_date in posts
+        }
+        names = set().union(*found.values())
+        tag_ids = get_tag_ids(names)
+        entries = [
+            PostTag(tag_id=tag_ids[name], post_id=pk, pub_date=pub_date)
+            for (pk, pub_date), post_names in found.items()
+            for name in post_names
+        ]
+        PostTag.objects.bulk_create(entries, ignore_conflicts=True)
+        return names, len(entries)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = Post.objects.values_list('pk', 'text', 'pub_date').iterator(
+            chunk_size=batch_size
+        )
+        touched, total = set(), 0
+        for batch in batched(posts, batch_size):
+            with transaction.atomic():
+                names, created = self.index_batch(batch)
+            touched |= names
+            total += created
+        bump_generation(*(TAG_SCOPE.format(name) for name in touched))
+        self.stdout.write(
+            f'Тегов: {len(touched)}, пар тег–пост: {total}'
+        )
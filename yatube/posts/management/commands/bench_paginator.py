@@ -0,0 +1,47 @@
+from timeit import repeat
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import get_template
+
+from posts.utils import get_page_window
+
+TEMPLATE_NAME = 'posts/includes/paginator.html'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время рендеринга posts/includes/paginator.html '
+        'при растущем числе постов (без обращений к базе).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int,
+            default=[1_000, 10_000, 100_000, 500_000],
+            help='Количество постов в ленте.'
+        )
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--number', type=int, default=200)
+
+    def handle(self, *args, **options):
+        template = get_template(TEMPLATE_NAME)
+        self.stdout.write(
+            f'{"posts":>10} {"pages":>8} {"render, ms":>11} {"bytes":>7}'
+        )
+        for size in options['sizes']:
+            paginator = Paginator(range(size), options['per_page'])
+            page_obj = paginator.get_page(paginator.num_pages // 2)
+            page_obj.page_window = get_page_window(
+                page_obj.number, paginator.num_pages
+            )
+            context = {'page_obj': page_obj}
+            html = template.render(context)
+            best = min(repeat(
+                lambda: template.render(context),
+                number=options['number'], repeat=3
+            ))
+            self.stdout.write(
+                f'{size:>10} {paginator.num_pages:>8} '
+                f'{best / options["number"] * 1000:>11.3f} {len(html):>7}'
+            )
@@ -0,0 +1,93 @@
+import tempfile
+from io import BytesIO
+from statistics import median
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+
+from posts.fragments import CARD_THUMBNAIL
+from posts.models import Post, User
+from posts.thumbnails import generate_thumbnails, prefetch_thumbnails
+
+TEMPLATE_NAME = 'posts/includes/post_card.html'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет рендер страницы карточек с поиском миниатюр по одной '
+        'и пачкой на страницу. Данные создаются в транзакции и '
+        'откатываются, картинки — во временном каталоге.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--samples', type=int, default=30)
+
+    def build_page(self, per_page):
+        author = User.objects.create(username='bench_thumbnails')
+        for i in range(per_page):
+            # Разный цвет — разные файлы: одинаковые картинки хранилище
+            # сводит к одному файлу и одной миниатюре
+            buffer = BytesIO()
+            color = (90, 120, i * 20 % 256)
+            Image.new('RGB', (1200, 900), color).save(buffer, 'jpeg')
+            post = Post.objects.create(
+                author=author, text=f'bench {i}',
+                image=SimpleUploadedFile(f'bench_{i}.jpg', buffer.getvalue())
+            )
+            generate_thumbnails(post.pk)
+        # Карточка с вариантами не ищет миниатюру sorl-thumbnail, а
+        # замеряется именно этот поиск
+        Post.objects.filter(author=author).update(image_variants='')
+        return author
+
+    def render(self, author, prefetch):
+        posts = list(Post.objects.filter(author=author).select_related(
+            'author', 'group'
+        ))
+        if prefetch:
+            prefetch_thumbnails(posts, CARD_THUMBNAIL)
+        for post in posts:
+            render_to_string(TEMPLATE_NAME, {'post': post})
+
+    def measure(self, author, prefetch, cold, samples):
+        timings, queries = [], []
+        for _ in range(samples):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = perf_counter()
+                self.render(author, prefetch)
+                timings.append(perf_counter() - started)
+            queries.append(len(captured))
+        return median(timings) * 1000, median(queries)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root, POST_THUMBNAIL_WORKERS=0
+        ):
+            with transaction.atomic():
+                author = self.build_page(options['per_page'])
+                self.stdout.write(
+                    f'{"миниатюры":<10} {"кэш":<8} {"рендер, мс":>11} '
+                    f'{"запросов":>9}'
+                )
+                for cold in (True, False):
+                    for prefetch in (False, True):
+                        ms, queries = self.measure(
+                            author, prefetch, cold, options['samples']
+                        )
+                        self.stdout.write(
+                            f'{"пачкой" if prefetch else "по одной":<10} '
+                            f'{"холодный" if cold else "тёплый":<8} '
+                            f'{ms:>11.2f} {queries:>9}'
+                        )
+                transaction.set_rollback(True)
+        cache.clear()
+        self.stdout.write(f'Постов на странице: {options["per_page"]}')
@@ -0,0 +1,127 @@
+import random
+from statistics import median
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts.counters import reconcile_profiles
+from posts.feed import rebuild_feed
+from posts.models import FeedEntry, Follow, Post, User
+from posts.timeline import Timeline, reset_pull_flags
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает push, pull и гибридную ленту подписок на синтетическом '
+        'графе подписок. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=300)
+        parser.add_argument('--authors', type=int, default=300)
+        parser.add_argument(
+            '--celebrities', type=int, default=5,
+            help='Авторов, на которых подписаны все читатели.'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=50,
+            help='Подписок на обычных авторов у каждого читателя.'
+        )
+        parser.add_argument('--posts', type=int, default=20)
+        parser.add_argument('--samples', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def build_graph(self, options):
+        rnd = random.Random(options['seed'])
+        User.objects.bulk_create(
+            User(username=f'bench_reader_{i}')
+            for i in range(options['readers'])
+        )
+        User.objects.bulk_create(
+            User(username=f'bench_author_{i}')
+            for i in range(options['authors'] + options['celebrities'])
+        )
+        readers = list(User.objects.filter(
+            username__startswith='bench_reader_'
+        ).values_list('pk', flat=True))
+        authors = list(User.objects.filter(
+            username__startswith='bench_author_'
+        ).values_list('pk', flat=True))
+        celebrities = authors[:options['celebrities']]
+        regular = authors[options['celebrities']:]
+        follows = []
+        for reader in readers:
+            followed = set(celebrities) | set(rnd.sample(
+                regular, min(options['follows'], len(regular))
+            ))
+            follows.extend(
+                Follow(user_id=reader, author_id=author)
+                for author in followed
+            )
+        Follow.objects.bulk_create(follows)
+        Post.objects.bulk_create(
+            (
+                Post(author_id=author, text=f'bench {author} {i}')
+                for author in authors
+                for i in range(options['posts'])
+            )
+        )
+        # bulk_create обходит сигналы: без профилей и счётчиков у всех
+        # авторов ноль подписчиков и гибридный режим не отличить от push
+        reconcile_profiles()
+        return readers
+
+    def time_reads(self, readers, samples, warm):
+        timings = []
+        for reader in samples:
+            if not warm:
+                cache.clear()
+            started = perf_counter()
+            Timeline(User(pk=reader))[:10]
+            timings.append(perf_counter() - started)
+        return median(timings) * 1000
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            readers = self.build_graph(options)
+            samples = random.Random(options['seed']).sample(
+                readers, min(options['samples'], len(readers))
+            )
+            started = perf_counter()
+            for reader in samples:
+                list(Post.objects.filter(
+                    author__following__user_id=reader
+                ).select_related('author', 'group')[:10])
+            join_ms = (perf_counter() - started) / len(samples) * 1000
+            self.stdout.write(
+                f'join по Follow (без ленты): {join_ms:.2f} мс на чтение'
+            )
+            self.stdout.write(
+                f'{"режим":<8} {"порог":>7} {"строк ленты":>12} '
+                f'{"сборка, с":>10} {"холодно, мс":>12} {"тепло, мс":>10}'
+            )
+            modes = (
+                ('push', len(readers) + 1),
+                ('hybrid', max(options['follows'], len(readers) // 2)),
+                ('pull', 0),
+            )
+            for name, threshold in modes:
+                with override_settings(TIMELINE_PULL_THRESHOLD=threshold):
+                    cache.clear()
+                    reset_pull_flags()
+                    started = perf_counter()
+                    for reader in readers:
+                        rebuild_feed(reader)
+                    build = perf_counter() - started
+                    rows = FeedEntry.objects.count()
+                    cold = self.time_reads(readers, samples, warm=False)
+                    warm = self.time_reads(readers, samples, warm=True)
+                self.stdout.write(
+                    f'{name:<8} {threshold:>7} {rows:>12} '
+                    f'{build:>10.2f} {cold:>12.2f} {warm:>10.2f}'
+                )
+            transaction.set_rollback(True)
+        cache.clear()
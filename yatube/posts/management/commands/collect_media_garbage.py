@@ -0,0 +1,95 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.variants import VARIANTS_DIR, split_variants, variant_name
+
+IMAGES_DIR = 'posts'
+
+
+def walk(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in directories:
+        yield from walk(storage, f'{path}/{directory}')
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые не ссылается ни один пост, '
+        'вместе с их вариантами для srcset и миниатюрами. Свежие файлы '
+        'не трогает: пост с ними мог ещё не сохраниться.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не удалять файлы моложе стольких секунд.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько файлов будет удалено.'
+        )
+
+    def referenced(self):
+        names = set()
+        posts = Post.objects.exclude(image='').values_list(
+            'image', 'image_variants'
+        )
+        for image, variants in posts.iterator():
+            names.add(image)
+            names.update(
+                variant_name(image, width, extension)
+                for width, extension in split_variants(variants)
+            )
+        return names
+
+    def garbage(self, storage, referenced, min_age):
+        if not storage.exists(IMAGES_DIR):
+            return
+        threshold = timezone.now() - timedelta(seconds=min_age)
+        for name in walk(storage, IMAGES_DIR):
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > threshold:
+                continue
+            yield name
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        referenced = self.referenced()
+        deleted = 0
+        for batch in batched(
+            self.garbage(storage, referenced, options['min_age']),
+            options['batch_size']
+        ):
+            if not options['dry_run']:
+                for name in batch:
+                    if not name.startswith(f'{VARIANTS_DIR}/'):
+                        # Миниатюры sorl-thumbnail и их записи в KVStore
+                        default.kvstore.delete(ImageFile(name, storage))
+                    storage.delete(name)
+            deleted += len(batch)
+            self.stdout.write(
+                f'{"Найдено" if options["dry_run"] else "Удалено"}: '
+                f'{deleted}, последний: {os.path.basename(batch[-1])}'
+            )
+        self.stdout.write(f'Всего файлов без ссылок: {deleted}')
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from posts.models import (Comment, FeedEntry, Follow, Group, Post, PostTag,
+                          User)
+
+# Признаки плана, которые на горячих запросах считаем ошибкой.
+FULL_SCAN_MARKERS = ('USE TEMP B-TREE',)
+
+
+def is_full_table_scan(detail):
+    """SCAN по таблице без индекса. SCAN ... USING INDEX — это
+    упорядоченный обход индекса, который останавливается на LIMIT."""
+    return detail.startswith('SCAN') and 'INDEX' not in detail
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает EXPLAIN QUERY PLAN (SQLite) для запросов ленточных '
+        'страниц и отмечает полные сканы и сортировки во временном B-tree.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найден полный скан.'
+        )
+
+    def get_queries(self):
+        """Запросы в том виде, в котором их выполняют представления."""
+        per_page = settings.POSTS_PER_PAGE
+        now = timezone.now()
+        older = Q(pub_date__lt=now) | Q(pub_date=now, pk__lt=1)
+        keyset = ('-pub_date', '-pk')
+        return {
+            'index': Post.objects.select_related(
+                'author', 'group'
+            )[:per_page],
+            'index (cursor)': Post.objects.select_related(
+                'author', 'group'
+            ).filter(older).order_by(*keyset)[:per_page + 1],
+            'group_posts: group': Group.objects.filter(slug='slug'),
+            'group_posts': Post.objects.filter(group_id=1)[:per_page],
+            'group_posts (cursor)': Post.objects.filter(
+                group_id=1
+            ).filter(older).order_by(*keyset)[:per_page + 1],
+            'profile: author': User.objects.filter(username='username'),
+            'profile': Post.objects.filter(author_id=1)[:per_page],
+            'profile (cursor)': Post.objects.filter(
+                author_id=1
+            ).filter(older).order_by(*keyset)[:per_page + 1],
+            'profile: following': Follow.objects.filter(
+                author_id=1, user_id=1
+            ),
+            'post_detail': Post.objects.select_related(
+                'author', 'group'
+            ).filter(pk=1),
+            'post_detail: comments': Comment.objects.filter(
+                post_id=1
+            ).order_by('created', 'id')[:settings.COMMENTS_PER_PAGE + 1],
+            'post_comments (cursor)': Comment.objects.filter(post_id=1).filter(
+                Q(created__gt=now) | Q(created=now, pk__gt=1)
+            ).select_related('author').order_by(
+                'created', 'id'
+            )[:settings.COMMENTS_PER_PAGE + 1],
+            'follow_index': FeedEntry.objects.filter(
+                user_id=1
+            ).order_by('-pub_date', '-post_id').values_list(
+                'pub_date', 'post_id'
+            )[:per_page],
+            'follow_index: pulled author': Post.objects.filter(
+                author_id=1
+            ).order_by('-pub_date', '-pk').values_list(
+                'pub_date', 'pk'
+            )[:settings.TIMELINE_AUTHOR_LENGTH],
+            'followers': Follow.objects.filter(author_id=1),
+            'tag_posts': PostTag.objects.filter(
+                tag_id=1
+            ).order_by('-pub_date', '-post_id').values_list(
+                'pub_date', 'post_id'
+            )[:per_page],
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только у SQLite.')
+        problems = 0
+        with connection.cursor() as cursor:
+            for name, queryset in self.get_queries().items():
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    bad = is_full_table_scan(detail) or any(
+                        marker in detail for marker in FULL_SCAN_MARKERS
+                    )
+                    problems += bad
+                    line = f'  {detail}'
+                    self.stdout.write(
+                        self.style.ERROR(line) if bad else line
+                    )
+        if problems and options['strict']:
+            raise CommandError(f'Найдено проблемных шагов плана: {problems}')
+        self.stdout.write(f'Проблемных шагов плана: {problems}')
@@ -0,0 +1,63 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.variants import available_formats, generate_variants
+
+
+def try_generate(name):
+    """Ошибка одной картинки не должна останавливать весь пул."""
+    try:
+        return generate_variants(name)
+    except Exception as error:
+        return error
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт варианты картинок для srcset у постов без них. '
+        'Картинки обрабатывает пул процессов, базу обновляет '
+        'основной процесс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать варианты и у постов, где они уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['force']:
+            posts = posts.filter(image_variants='')
+        images = dict(posts.values_list('pk', 'image'))
+        self.stdout.write(
+            f'Постов: {len(images)}, форматы: {", ".join(available_formats())}'
+        )
+        # Дочерние процессы не должны наследовать открытое соединение
+        connection.close()
+        with ProcessPoolExecutor(
+            options['workers'],
+            mp_context=multiprocessing.get_context('fork')
+        ) as executor:
+            # Одинаковые картинки хранятся одним файлом
+            names = sorted(set(images.values()))
+            variants = dict(zip(names, executor.map(try_generate, names)))
+        updated = failed = 0
+        for pk, image in images.items():
+            result = variants[image]
+            if isinstance(result, Exception):
+                failed += 1
+                self.stderr.write(f'Пост {pk}: {result}')
+                continue
+            post = Post.objects.get(pk=pk)
+            post.image_variants = result
+            post.save(update_fields=['image_variants', 'updated'])
+            updated += 1
+        self.stdout.write(
+            f'Обработано постов: {updated}, с ошибками: {failed}'
+        )
@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+def generate(post_id):
+    try:
+        generate_thumbnails(post_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры всех размеров из POST_THUMBNAILS для постов '
+        'с картинками, загруженных до фоновой генерации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').values_list(
+            'pk', flat=True
+        )
+        with ThreadPoolExecutor(options['workers']) as executor:
+            done = sum(1 for _ in executor.map(generate, post_ids.iterator()))
+        self.stdout.write(f'Обработано постов: {done}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import rebuild_feed
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает материализованные ленты подписок. '
+        'Безопасно запускать повторно: каждая лента пересобирается '
+        'в отдельной транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать ленты только этих пользователей.'
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(follower__isnull=False).distinct()
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        total = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            total += rebuild_feed(user_id, options['batch_size'])
+        self.stdout.write(f'Записей в лентах: {total}')
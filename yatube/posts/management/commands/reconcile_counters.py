@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_posts, reconcile_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, комментариев '
+        'и подписок пачками по первичному ключу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = reconcile_posts(batch_size)
+        profiles = reconcile_profiles(batch_size)
+        self.stdout.write(
+            f'Пересчитано постов: {posts}, профилей: {profiles}'
+        )
@@ -0,0 +1,85 @@
+"""Сведения о картинке поста, которые нужны шаблонам без чтения файла.
+
+Размеры, вес, основной цвет и размытая заглушка (LQIP) вычисляются
+один раз при загрузке, пока файл ещё в памяти или во временном
+каталоге, и сохраняются в полях Post.image_*. Посты, загруженные
+раньше, заполняет команда backfill_image_metadata.
+"""
+import base64
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Уменьшенная копия, по которой ищется основной цвет
+COLOR_SAMPLE_SIZE = (64, 64)
+COLOR_PALETTE = 8
+EXIF_ORIENTATION = 0x0112
+# Значения Orientation, при которых ширина и высота меняются местами
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+METADATA_FIELDS = (
+    'image_width', 'image_height', 'image_size', 'image_color',
+    'image_placeholder',
+)
+
+
+def dominant_color(image):
+    """Самый частый цвет палитры из COLOR_PALETTE цветов: '#rrggbb'."""
+    sample = image.copy()
+    sample.thumbnail(COLOR_SAMPLE_SIZE)
+    palette_image = sample.convert('RGB').quantize(COLOR_PALETTE)
+    _, index = max(palette_image.getcolors())
+    palette = palette_image.getpalette()
+    red, green, blue = palette[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def placeholder(image):
+    """Крошечный JPEG в виде data URI: браузер растягивает и размывает
+    его, пока не загрузится настоящая картинка."""
+    width = settings.POST_IMAGE_PLACEHOLDER_WIDTH
+    height = max(1, round(image.height * width / image.width))
+    small = image.convert('RGB').resize((width, height), Image.BILINEAR)
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def extract_metadata(file):
+    """Словарь полей Post.image_* для открытого файла картинки."""
+    file.seek(0)
+    image = Image.open(file)
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+        width, height = height, width
+    # JPEG декодируется сразу в уменьшенном масштабе
+    image.draft('RGB', COLOR_SAMPLE_SIZE)
+    image = ImageOps.exif_transpose(image)
+    values = {
+        'image_width': width,
+        'image_height': height,
+        'image_size': file.size,
+        'image_color': dominant_color(image),
+        'image_placeholder': placeholder(image),
+    }
+    file.seek(0)
+    return values
+
+
+def apply_metadata(post):
+    """Заполняет поля метаданных поста по его картинке; без картинки
+    сбрасывает их."""
+    if not post.image:
+        values = {
+            field: post._meta.get_field(field).get_default()
+            for field in METADATA_FIELDS
+        }
+    elif not post.image._committed:
+        # Только что загруженный файл ещё не записан в хранилище
+        values = extract_metadata(post.image.file)
+    else:
+        with post.image.open():
+            values = extract_metadata(post.image.file)
+    for field, value in values.items():
+        setattr(post, field, value)
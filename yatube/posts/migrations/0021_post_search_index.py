@@ -0,0 +1,73 @@
+from django.db import migrations
+
+# Полнотекстовый индекс постов в SQLite FTS5: rowid совпадает с id
+# поста, триггеры держат его в согласии с текстом и названием группы.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, group_title, tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO posts_post_fts(rowid, text, group_title)
+    SELECT post.id, post.text, coalesce(grp.title, '')
+    FROM posts_post AS post
+    LEFT JOIN posts_group AS grp ON grp.id = post.group_id
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, text, group_title)
+        VALUES (new.id, new.text, coalesce(
+            (SELECT title FROM posts_group WHERE id = new.group_id), ''
+        ));
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_update
+    AFTER UPDATE OF text, group_id ON posts_post BEGIN
+        UPDATE posts_post_fts SET text = new.text, group_title = coalesce(
+            (SELECT title FROM posts_group WHERE id = new.group_id), ''
+        ) WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_post_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_group_fts_update
+    AFTER UPDATE OF title ON posts_group BEGIN
+        UPDATE posts_post_fts SET group_title = new.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    """,
+]
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_group_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # В других СУБД поиск работает без индекса, см. posts.search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
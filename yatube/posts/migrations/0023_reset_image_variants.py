@@ -0,0 +1,23 @@
+from django.db import migrations
+from django.db.models.functions import Now
+
+
+def reset_variants(apps, schema_editor):
+    """Имена вариантов теперь строятся по полному имени картинки.
+    Старые файлы подберёт collect_media_garbage, новые создаст
+    generate_image_variants; до тех пор карточки берут миниатюры."""
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.exclude(image_variants='').update(
+        image_variants='', updated=Now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_variants, migrations.RunPython.noop),
+    ]
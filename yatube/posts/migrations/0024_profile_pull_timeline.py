@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pull_authors(apps, schema_editor):
+    Profile = apps.get_model('posts', 'Profile')
+    Profile.objects.filter(
+        followers_count__gte=settings.TIMELINE_PULL_THRESHOLD
+    ).update(pull_timeline=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_reset_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='pull_timeline',
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                verbose_name='Посты читаются из кэша при чтении ленты'
+            ),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+    ]
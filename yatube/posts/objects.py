@@ -0,0 +1,90 @@
+"""Кэш отдельных объектов Post, Group и User со сквозным чтением.
+
+Объект хранится под ключом по pk, натуральный ключ (slug, username)
+указывает на pk. Указатель не нужно удалять при переименовании:
+объект по нему сверяется с запрошенным значением. Сигналы удаляют
+объект из кэша при сохранении и удалении.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Group, Post, User
+
+OBJECT_KEY = 'object:{label}:{pk}'
+NATURAL_KEY = 'object:{label}:{field}:{value}'
+
+
+class ObjectCache:
+    def __init__(self, model, natural_key=None):
+        self.model = model
+        self.natural_key = natural_key
+        self.label = model._meta.label_lower
+
+    def key(self, pk):
+        return OBJECT_KEY.format(label=self.label, pk=pk)
+
+    def natural_key_of(self, value):
+        return NATURAL_KEY.format(
+            label=self.label, field=self.natural_key, value=value
+        )
+
+    def store(self, obj):
+        data = {self.key(obj.pk): obj}
+        if self.natural_key:
+            data[self.natural_key_of(getattr(obj, self.natural_key))] = obj.pk
+        cache.set_many(data, settings.OBJECT_CACHE_TIMEOUT)
+
+    def get_many(self, pks):
+        """Объекты по pk: найденные в кэше и остальные одним запросом."""
+        keys = {self.key(pk): pk for pk in pks}
+        found = {
+            keys[key]: obj for key, obj in cache.get_many(keys).items()
+        }
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            loaded = self.model.objects.in_bulk(missing)
+            cache.set_many(
+                {self.key(pk): obj for pk, obj in loaded.items()},
+                settings.OBJECT_CACHE_TIMEOUT
+            )
+            found.update(loaded)
+        return found
+
+    def get(self, **lookup):
+        """Как Model.objects.get по pk или натуральному ключу."""
+        (field, value), = lookup.items()
+        if field in ('pk', 'id'):
+            obj = self.get_many([value]).get(value)
+            if obj is None:
+                raise self.model.DoesNotExist
+            return obj
+        if field != self.natural_key:
+            raise ValueError(f'{self.label}: нет кэша по полю {field}.')
+        pk = cache.get(self.natural_key_of(value))
+        if pk is not None:
+            obj = cache.get(self.key(pk))
+            if obj is not None and getattr(obj, field) == value:
+                return obj
+        obj = self.model.objects.get(**lookup)
+        self.store(obj)
+        return obj
+
+    def invalidate(self, *pks):
+        cache.delete_many([self.key(pk) for pk in pks])
+
+
+post_cache = ObjectCache(Post)
+group_cache = ObjectCache(Group, 'slug')
+user_cache = ObjectCache(User, 'username')
+
+
+def get_cached_or_404(object_cache, **lookup):
+    """Замена get_object_or_404 для объектов из кэша."""
+    try:
+        return object_cache.get(**lookup)
+    except object_cache.model.DoesNotExist:
+        raise Http404(
+            f'No {object_cache.model._meta.object_name} matches the '
+            'given query.'
+        )
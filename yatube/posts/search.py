@@ -0,0 +1,148 @@
+"""Полнотекстовый поиск постов по индексу SQLite FTS5.
+
+Индекс posts_post_fts создаётся миграцией 0021 и обновляется
+триггерами, поэтому его не нужно трогать из Python. Результаты
+упорядочены по BM25, страницы выбираются курсором (ранг, id):
+следующая страница не пересчитывает предыдущие.
+
+В других СУБД индекса нет, и поиск сводится к icontains по тексту.
+"""
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# Вес совпадений в тексте и в названии группы для bm25()
+TEXT_WEIGHT = 1.0
+GROUP_TITLE_WEIGHT = 0.5
+SNIPPET_TOKENS = 16
+# Служебные символы вместо тегов: фрагмент экранируется целиком
+MARK_START, MARK_END = '\x02', '\x03'
+TERM_RE = re.compile(r'\w+')
+
+
+def is_indexed():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос FTS5 из пользовательской строки: все слова обязательны,
+    последнее ищется как префикс. Операторы FTS5 не пропускаются."""
+    terms = TERM_RE.findall(query.lower())
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def encode_cursor(rank, pk):
+    raw = f'{rank!r}|{pk}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(ранг, id) или None для битого курсора."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        rank, pk = urlsafe_b64decode(padded.encode()).decode().split('|')
+        return float(rank), int(pk)
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return None
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def search_ids(expression, cursor=None, limit=None):
+    """[(id, ранг), ...] по возрастанию bm25: чем меньше, тем лучше."""
+    sql = (
+        f'SELECT rowid, bm25({FTS_TABLE}, %s, %s) AS score '
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [TEXT_WEIGHT, GROUP_TITLE_WEIGHT, expression]
+    if cursor is not None:
+        rank, pk = cursor
+        sql = (
+            f'SELECT rowid, score FROM ({sql}) '
+            'WHERE score > %s OR (score = %s AND rowid > %s)'
+        )
+        params += [rank, rank, pk]
+    sql += ' ORDER BY score, rowid'
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        return db.fetchall()
+
+
+def snippets(expression, ids):
+    """{id: фрагмент с подсветкой} только для постов страницы."""
+    if not ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = (
+        f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        f'AND rowid IN ({placeholders})'
+    )
+    params = [MARK_START, MARK_END, '…', SNIPPET_TOKENS, expression, *ids]
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        return {pk: highlight(snippet) for pk, snippet in db.fetchall()}
+
+
+def search_posts(query, token=None, per_page=None):
+    """Страница результатов [(пост, фрагмент), ...] и курсор следующей
+    страницы или None."""
+    per_page = per_page or settings.POSTS_PER_PAGE
+    expression = match_expression(query)
+    if expression is None:
+        return [], None
+    if not is_indexed():
+        posts = list(Post.objects.filter(
+            text__icontains=query
+        ).select_related('author', 'group')[:per_page])
+        return [(post, post.text) for post in posts], None
+    cursor = decode_cursor(token) if token else None
+    rows = search_ids(expression, cursor, per_page + 1)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    ids = [pk for pk, _ in rows]
+    posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+    found = snippets(expression, ids)
+    results = [
+        (posts[pk], found.get(pk, posts[pk].text))
+        for pk in ids if pk in posts
+    ]
+    if not has_next:
+        return results, None
+    last_pk, last_rank = rows[-1]
+    return results, encode_cursor(last_rank, last_pk)
+
+
+def filter_matching(queryset, query):
+    """Посты queryset, подходящие под запрос, — для поиска в админке."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset
+    if not is_indexed():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [expression]
+    ))
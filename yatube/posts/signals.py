@@ -0,0 +1,271 @@
+import logging
+
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, feed, metadata, tags, thumbnails, timeline
+from .caching import (AUTHOR_SCOPE, FEEDS_SCOPE, GROUP_SCOPE, INDEX_SCOPE,
+                      POST_SCOPE, TAG_SCOPE, bump_generation)
+from .models import Comment, Follow, Group, Post, Profile, User
+from .objects import group_cache, post_cache, user_cache
+
+logger = logging.getLogger(__name__)
+
+
+# Счётчики обновляются первыми: лента подписок читает их.
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_profile(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.shift_profile(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.shift_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_profile(instance.author_id, followers_count=1)
+        counters.shift_profile(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.shift_profile(instance.author_id, followers_count=-1)
+    counters.shift_profile(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.invalidate_author_timeline(instance.author_id)
+        feed.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def drop_deleted_post(sender, instance, **kwargs):
+    timeline.invalidate_author_timeline(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_new_follow(sender, instance, created, **kwargs):
+    if created:
+        feed.update_mode(instance.author_id)
+        feed.backfill_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_deleted_follow(sender, instance, **kwargs):
+    feed.prune_follow(instance.user_id, instance.author_id)
+    feed.update_mode(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, **kwargs):
+    image = instance.image.name
+    if image and image != getattr(instance, '_previous_image', None):
+        thumbnails.schedule(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    instance._previous_group_id = instance._previous_image = None
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(pre_save, sender=Post)
+def extract_image_metadata(sender, instance, update_fields=None, **kwargs):
+    """Сведения о новой картинке снимаются до записи файла в хранилище."""
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if instance.image.name == instance._previous_image:
+        return
+    try:
+        metadata.apply_metadata(instance)
+    except Exception:
+        logger.exception(
+            'Не удалось прочитать картинку поста %s', instance.pk
+        )
+
+
+@receiver(post_save, sender=Post)
+def index_post_tags(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'text' not in update_fields:
+        instance._tag_names = tags.post_tag_names(instance.pk)
+    else:
+        instance._tag_names = tags.sync_post_tags(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    instance._tag_names = tags.post_tag_names(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_generations(sender, instance, **kwargs):
+    group_ids = {
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    } - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    username = User.objects.filter(pk=instance.author_id).values_list(
+        'username', flat=True
+    ).first()
+    bump_generation(
+        INDEX_SCOPE,
+        AUTHOR_SCOPE.format(username),
+        POST_SCOPE.format(instance.pk),
+        *(GROUP_SCOPE.format(slug) for slug in slugs),
+        *(TAG_SCOPE.format(name)
+          for name in getattr(instance, '_tag_names', ()))
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_generations(sender, instance, **kwargs):
+    bump_generation(POST_SCOPE.format(instance.post_id))
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_slug(sender, instance, **kwargs):
+    instance._previous_slug = instance._previous_title = None
+    if instance.pk is not None:
+        instance._previous_slug, instance._previous_title = (
+            Group.objects.filter(pk=instance.pk).values_list(
+                'slug', 'title'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_generations(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    bump_generation(
+        FEEDS_SCOPE,
+        *(GROUP_SCOPE.format(slug) for slug in slugs - {None})
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_generations(sender, instance, **kwargs):
+    username = User.objects.filter(pk=instance.author_id).values_list(
+        'username', flat=True
+    ).first()
+    bump_generation(AUTHOR_SCOPE.format(username))
+
+
+# Поля пользователя, которые видны на карточках постов
+USER_CARD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_card(sender, instance, update_fields=None, **kwargs):
+    instance._previous_card = None
+    if instance.pk is None or (
+        update_fields and not set(update_fields) & set(USER_CARD_FIELDS)
+    ):
+        return
+    instance._previous_card = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_CARD_FIELDS).first()
+
+
+def card_changed(user):
+    """Регистрация и смена пароля или last_login карточек не меняют."""
+    previous = getattr(user, '_previous_card', None)
+    if previous is None:
+        return False
+    return previous != tuple(
+        getattr(user, field) for field in USER_CARD_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_user_generations(sender, instance, created, **kwargs):
+    if not created and card_changed(instance):
+        bump_generation(FEEDS_SCOPE)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    post_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def forget_commented_post(sender, instance, **kwargs):
+    post_cache.invalidate(instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    group_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+def touch_posts(**lookup):
+    """Сдвигает updated, чтобы карточки постов отрисовались заново."""
+    posts = Post.objects.filter(**lookup)
+    pks = list(posts.values_list('pk', flat=True))
+    posts.update(updated=timezone.now())
+    post_cache.invalidate(*pks)
+
+
+@receiver(post_save, sender=User)
+def touch_author_posts(sender, instance, created, **kwargs):
+    if not created and card_changed(instance):
+        touch_posts(author_id=instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def touch_group_posts(sender, instance, created, **kwargs):
+    """На карточках видны только название и slug группы."""
+    previous = (
+        getattr(instance, '_previous_slug', None),
+        getattr(instance, '_previous_title', None),
+    )
+    if not created and previous != (instance.slug, instance.title):
+        touch_posts(group_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def touch_orphaned_posts(sender, instance, **kwargs):
+    touch_posts(group_id=instance.pk)
@@ -0,0 +1,54 @@
+"""Хранилище картинок постов с именами по содержимому.
+
+Имя файла — SHA-256 его байтов, поэтому повторная загрузка той же
+картинки не записывает новую копию, а получает имя уже лежащего файла.
+Вместе с именем общими становятся и миниатюры sorl-thumbnail, и
+варианты для srcset. Файлы не удаляются вместе с постами: их, как и
+миниатюры, убирает команда collect_media_garbage.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # Каталог по первым символам хэша, чтобы в одном не копились
+    # десятки тысяч файлов
+    SHARD_LENGTH = 2
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, hexdigest[:self.SHARD_LENGTH], hexdigest + extension
+        ).replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        """Уже существующий файл с тем же содержимым не перезаписывается.
+        При одновременной записи одной картинки вторая копия получит
+        имя с суффиксом, как в FileSystemStorage.
+
+        У найденного файла обновляется время изменения: он мог быть
+        сиротой, и --min-age сборщика мусора должен защитить его до
+        того, как на него сошлётся новый пост.
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+        return name
@@ -0,0 +1,112 @@
+"""Хэштеги постов и ленты по ним.
+
+Теги «#слово» разбираются из текста при сохранении поста и
+раскладываются в обратный индекс PostTag с датой публикации поста.
+Лента тега — один проход по индексу (tag, -pub_date), как у ленты
+подписок.
+"""
+import re
+
+from django.db.models import Q
+
+from .models import Post, PostTag, Tag
+from .utils import CURSOR_OLDER
+
+# Теги длиннее Tag.name пропускаются, а не обрезаются до другого тега
+TAG_RE = re.compile(r'(?<![\w#&])#(\w{1,50})(?!\w)')
+
+
+def extract_tags(text):
+    """Имена тегов из текста в нижнем регистре, без повторов."""
+    return {name.lower() for name in TAG_RE.findall(text)}
+
+
+def get_tag_ids(names):
+    """{имя: id} с созданием недостающих тегов одним bulk_create."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True
+    )
+    return dict(
+        Tag.objects.filter(name__in=names).values_list('name', 'pk')
+    )
+
+
+def sync_post_tags(post):
+    """Приводит индекс к тегам из текста поста. Возвращает имена
+    тегов, ленты которых затронуты: текущих и убранных."""
+    wanted = extract_tags(post.text)
+    current = dict(
+        PostTag.objects.filter(post=post).values_list('tag__name', 'pk')
+    )
+    removed = set(current) - wanted
+    added = wanted - set(current)
+    if removed:
+        PostTag.objects.filter(
+            pk__in=[current[name] for name in removed]
+        ).delete()
+    if added:
+        PostTag.objects.bulk_create(
+            [
+                PostTag(tag_id=tag_id, post=post, pub_date=post.pub_date)
+                for tag_id in get_tag_ids(added).values()
+            ],
+            ignore_conflicts=True
+        )
+    return wanted | removed
+
+
+def post_tag_names(post_id):
+    return set(
+        PostTag.objects.filter(post_id=post_id).values_list(
+            'tag__name', flat=True
+        )
+    )
+
+
+class TagFeed:
+    """Посты с тегом в виде последовательности для paginate_page:
+    срезы и count() для Paginator, keyset() для курсоров."""
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.entries = PostTag.objects.filter(tag=tag).order_by(
+            '-pub_date', '-post_id'
+        ).values_list('pub_date', 'post_id')
+
+    def count(self):
+        return self.entries.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        return self.hydrate(self.entries[index])
+
+    def keyset(self, cursor, limit):
+        """Записи старше или новее курсора (direction, pub_date, pk)."""
+        if cursor is None:
+            return self[:limit]
+        direction, pub_date, pk = cursor
+        if direction == CURSOR_OLDER:
+            entries = self.entries.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, post_id__lt=pk)
+            )
+        else:
+            entries = self.entries.filter(
+                Q(pub_date__gt=pub_date)
+                | Q(pub_date=pub_date, post_id__gt=pk)
+            ).order_by('pub_date', 'post_id')
+        return self.hydrate(entries[:limit])
+
+    @staticmethod
+    def hydrate(items):
+        items = list(items)
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for _, pk in items]
+        )
+        return [posts[pk] for _, pk in items if pk in posts]
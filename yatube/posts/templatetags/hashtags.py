@@ -0,0 +1,25 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from ..tags import TAG_RE
+
+register = template.Library()
+
+
+@register.filter
+def link_hashtags(text):
+    """Текст поста со ссылками на ленты его тегов."""
+    parts = []
+    position = 0
+    for match in TAG_RE.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        name = match.group(1)
+        parts.append(format_html(
+            '<a href="{}">#{}</a>',
+            reverse('posts:tag', args=[name.lower()]), name
+        ))
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
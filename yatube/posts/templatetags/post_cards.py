@@ -0,0 +1,10 @@
+from django import template
+
+from ..fragments import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, template_name):
+    return render_cards(posts, template_name)
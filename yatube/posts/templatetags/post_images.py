@@ -0,0 +1,60 @@
+from django import template
+from django.utils.html import format_html
+
+from ..thumbnails import get_existing_thumbnail
+from ..variants import parse_variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, size):
+    """Готовая миниатюра или None, если фоновый пул её ещё не создал.
+    Берётся из post.thumbnails, если страница загрузила их заранее."""
+    thumbnails = getattr(post, 'thumbnails', {})
+    if size in thumbnails:
+        return thumbnails[size]
+    return get_existing_thumbnail(post.image, size)
+
+
+@register.simple_tag
+def image_placeholder_style(post):
+    """CSS фона из основного цвета и размытой заглушки картинки: место
+    под картинку занято ещё до её загрузки."""
+    if not post.image_color:
+        return ''
+    if not post.image_placeholder:
+        return format_html('background-color: {};', post.image_color)
+    return format_html(
+        'background: {} url({}) center / cover no-repeat;',
+        post.image_color, post.image_placeholder
+    )
+
+
+def image_height(post, width):
+    """Высота при ширине width с пропорциями исходной картинки."""
+    if post.image_width and post.image_height:
+        return round(width * post.image_height / post.image_width)
+    return None
+
+
+def _srcset(sources):
+    return ', '.join(f'{url} {width}w' for url, width in sources)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post, sizes, width, height=None, css_class=''):
+    """<picture> с WebP и JPEG-вариантами картинки поста. Без height
+    высота считается по сохранённым размерам картинки."""
+    sources = parse_variants(post.image.name, post.image_variants)
+    jpeg = sources.get('image/jpeg', [])
+    return {
+        'webp_srcset': _srcset(sources.get('image/webp', [])),
+        'jpeg_srcset': _srcset(jpeg),
+        'src': jpeg[-1][0] if jpeg else post.image.url,
+        'sizes': sizes,
+        'width': width,
+        'height': height or image_height(post, width),
+        'css_class': css_class,
+        'placeholder_style': image_placeholder_style(post),
+    }
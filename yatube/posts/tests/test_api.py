@@ -0,0 +1,134 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class FeedApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Котики', slug='cats', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Привет', group=self.group
+        )
+        self.client = Client()
+
+    def test_feeds_return_compact_rows(self):
+        urls = [
+            reverse('posts:api_main'),
+            reverse('posts:api_group', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.user.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['results'], [{
+                    'id': self.post.pk,
+                    'text': 'Привет',
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': 'auth',
+                    'group': 'cats',
+                    'image': None,
+                    'comments_count': 0,
+                }])
+                self.assertIsNone(data['older_cursor'])
+
+    def test_unknown_group_and_author_are_404(self):
+        for url in [
+            reverse('posts:api_group', args=['nope']),
+            reverse('posts:api_profile', args=['nope']),
+            reverse('posts:api_post_detail', args=[0]),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cursor_pages_cover_feed(self):
+        for i in range(14):
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+        url = reverse('posts:api_main')
+        first = self.client.get(url).json()
+        second = self.client.get(url, {'cursor': first['older_cursor']}).json()
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(ids), 15)
+        self.assertEqual(len(set(ids)), 15)
+        self.assertIsNone(second['older_cursor'])
+        back = self.client.get(url, {'cursor': second['newer_cursor']}).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_unchanged_page_is_304_without_queries(self):
+        url = reverse('posts:api_main')
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(author=self.user, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail_with_comment_cursor(self):
+        for i in range(3):
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'Комментарий {i}'
+            )
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        with self.settings(COMMENTS_PER_PAGE=2):
+            data = self.client.get(url).json()
+            self.assertEqual(data['comments_count'], 3)
+            self.assertEqual(
+                [comment['text'] for comment in data['comments']],
+                ['Комментарий 0', 'Комментарий 1']
+            )
+            rest = self.client.get(
+                url, {'cursor': data['comments_cursor']}
+            ).json()
+        self.assertEqual(rest['comments'][0]['text'], 'Комментарий 2')
+        self.assertIsNone(rest['comments_cursor'])
+
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Ещё')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_feed(self):
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        reader = User.objects.create_user(username='reader')
+        self.client.force_login(reader)
+        self.assertEqual(self.client.get(url).json()['results'], [])
+        Follow.objects.create(user=reader, author=self.user)
+        response = self.client.get(url)
+        self.assertEqual(
+            [row['id'] for row in response.json()['results']], [self.post.pk]
+        )
+        repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        Post.objects.create(author=self.user, text='Новый')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(len(fresh.json()['results']), 2)
+
+    def test_follow_feed_after_unfollow(self):
+        """Без Last-Modified If-Modified-Since не вернёт старую ленту."""
+        reader = User.objects.create_user(username='reader')
+        self.client.force_login(reader)
+        follow = Follow.objects.create(user=reader, author=self.user)
+        url = reverse('posts:api_follow_index')
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        follow.delete()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2050 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
@@ -0,0 +1,200 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+from django.utils.cache import get_cache_key
+
+from ..caching import (LOCK_SUFFIX, coalesced_cache_page, get_cache_metrics,
+                       reset_cache_metrics, set_validators)
+from ..models import Comment, Follow, Group, Post, User
+
+
+class CoalescedCachePageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_metrics()
+        self.calls = 0
+        self.request = RequestFactory().get('/feed/')
+
+    def make_view(self, timeout, **options):
+        @coalesced_cache_page(
+            timeout, key_prefix='test', stale_timeout=60, **options
+        )
+        def view(request):
+            self.calls += 1
+            return HttpResponse(str(self.calls))
+        return view
+
+    def test_fresh_entry_is_served_from_cache(self):
+        view = self.make_view(60, early_refresh=0)
+        view(self.request)
+        response = view(self.request)
+        self.assertEqual(response.content, b'1')
+        self.assertEqual(get_cache_metrics(), {'misses': 1, 'hits': 1})
+
+    def test_stale_entry_served_while_other_request_rebuilds(self):
+        view = self.make_view(0, early_refresh=0)
+        view(self.request)
+        cache_key = get_cache_key(self.request, 'test', 'GET', cache)
+        cache.add(cache_key + LOCK_SUFFIX, 1)
+
+        for _ in range(3):
+            self.assertEqual(view(self.request).content, b'1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(get_cache_metrics()['coalesced'], 3)
+
+        cache.delete(cache_key + LOCK_SUFFIX)
+        self.assertEqual(view(self.request).content, b'2')
+        self.assertEqual(get_cache_metrics()['stale_rebuilds'], 1)
+
+    def test_previous_prefix_served_while_other_request_rebuilds(self):
+        """После смены поколения ждёт только первый запрос по адресу."""
+        def make_view(key_prefix):
+            @coalesced_cache_page(
+                60, key_prefix=key_prefix, latest_prefix='test',
+                early_refresh=0
+            )
+            def view(request):
+                self.calls += 1
+                return HttpResponse(str(self.calls))
+            return view
+
+        make_view('test.1')(self.request)
+        with mock.patch.object(cache, 'add', return_value=False):
+            response = make_view('test.2')(self.request)
+        self.assertEqual(response.content, b'1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(get_cache_metrics()['coalesced'], 1)
+        self.assertFalse(
+            set_validators(response, '"etag"', 0).has_header('ETag')
+        )
+
+        self.assertEqual(make_view('test.2')(self.request).content, b'2')
+        with mock.patch.object(cache, 'add', return_value=False):
+            response = make_view('test.3')(self.request)
+        self.assertEqual(response.content, b'2')
+
+    def test_post_requests_bypass_cache(self):
+        view = self.make_view(60)
+        request = RequestFactory().post('/feed/')
+        view(request)
+        view(request)
+        self.assertEqual(self.calls, 2)
+
+    def test_junk_query_parameters_share_an_entry(self):
+        view = self.make_view(60, early_refresh=0)
+        factory = RequestFactory()
+        view(factory.get('/feed/', {'utm_source': 'a'}))
+        view(factory.get('/feed/', {'_': '123'}))
+        self.assertEqual(self.calls, 1)
+        view(factory.get('/feed/', {'page': 2, 'utm_source': 'a'}))
+        self.assertEqual(
+            view(factory.get('/feed/?ref=x&page=2')).content, b'2'
+        )
+        self.assertEqual(self.calls, 2)
+
+
+class FeedCacheReaderTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(author=self.author, text='Текст')
+        self.alice = User.objects.create_user(username='alice')
+        self.bob = User.objects.create_user(username='bob')
+        Follow.objects.create(user=self.alice, author=self.author)
+
+    def test_cached_pages_are_not_shared_between_readers(self):
+        alice, bob, anonymous = Client(), Client(), Client()
+        alice.force_login(self.alice)
+        bob.force_login(self.bob)
+        urls = [
+            reverse('posts:main'),
+            reverse('posts:profile', args=[self.author.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(alice.get(url), 'alice')
+                self.assertNotContains(bob.get(url), 'alice')
+                self.assertContains(bob.get(url), 'bob')
+                self.assertNotContains(anonymous.get(url), 'alice')
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.assertContains(alice.get(profile), 'Отписаться')
+        self.assertNotContains(bob.get(profile), 'Отписаться')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Текст', group=self.group
+        )
+        self.client = Client()
+        self.urls = [
+            reverse('posts:main'),
+            reverse('posts:group', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def etags(self):
+        return {url: self.client.get(url)['ETag'] for url in self.urls}
+
+    def test_unchanged_pages_are_304_without_queries(self):
+        for url, etag in self.etags().items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_pages_for_readers_have_no_last_modified(self):
+        """Иначе после входа If-Modified-Since вернул бы 304 на
+        анонимную страницу."""
+        url = reverse('posts:main')
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.client.force_login(self.user)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2050 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.user.username)
+
+    def test_logged_in_304_reads_only_session_and_user(self):
+        self.client.force_login(self.user)
+        url = reverse('posts:main')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_and_reader_change_etag(self):
+        etags = self.etags()
+        Post.objects.create(author=self.user, text='Новый', group=self.group)
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        etags = self.etags()
+        self.client.force_login(self.user)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_detail_changes_with_author_posts_count(self):
+        """На странице поста есть число постов автора."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.user, text='Другой пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        author = response.context['post'].author
+        self.assertEqual(author.profile.posts_count, 2)
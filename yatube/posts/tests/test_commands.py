@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Post, Profile, User
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feed_queries_use_composite_indexes(self):
+        out = StringIO()
+        call_command('explain_feeds', stdout=out, no_color=True)
+        output = out.getvalue()
+        for index_name in (
+            'post_pub_date_idx',
+            'post_author_pub_date_idx',
+            'post_group_pub_date_idx',
+            'comment_post_created_idx',
+            'follow_author_user_idx',
+            'posttag_tag_pub_date_idx',
+        ):
+            with self.subTest(index_name=index_name):
+                self.assertIn(index_name, output)
+        self.assertNotIn('SCAN posts_post\n', output)
+
+
+class RebuildFeedCommandTest(TestCase):
+    def test_rebuild_restores_feed(self):
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=reader, author=author)
+        for i in range(3):
+            Post.objects.create(author=author, text=f'Пост {i}')
+        expected = list(
+            FeedEntry.objects.filter(user=reader).values_list(
+                'post_id', 'pub_date'
+            )
+        )
+        FeedEntry.objects.all().delete()
+
+        call_command('rebuild_feed', stdout=StringIO())
+        call_command('rebuild_feed', 'reader', stdout=StringIO())
+
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=reader).values_list(
+                'post_id', 'pub_date'
+            )),
+            expected
+        )
+
+
+class ReconcileCountersCommandTest(TestCase):
+    def test_reconcile_fixes_drifted_counters(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=author, text='Пост')
+        Comment.objects.create(author=reader, post=post, text='Текст')
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.update(comments_count=7)
+        Profile.objects.filter(user=reader).delete()
+        Profile.objects.filter(user=author).update(
+            posts_count=0, followers_count=5
+        )
+
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            Profile.objects.filter(user=author).values_list(
+                'posts_count', 'followers_count', 'following_count'
+            ).get(),
+            (1, 1, 0)
+        )
+        self.assertEqual(
+            Profile.objects.get(user=reader).following_count, 1
+        )
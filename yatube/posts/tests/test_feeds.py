@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class SyndicationFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='Котики', slug='cats', description='Про котиков'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Первый пост', group=self.group
+        )
+        self.client = Client()
+
+    def test_feeds_list_posts(self):
+        feeds = {
+            reverse('posts:main_rss'): 'application/rss+xml',
+            reverse('posts:main_atom'): 'application/atom+xml',
+            reverse('posts:group_rss', args=['cats']): 'application/rss+xml',
+            reverse('posts:group_atom', args=['cats']): (
+                'application/atom+xml'
+            ),
+            reverse('posts:profile_rss', args=['auth']): (
+                'application/rss+xml'
+            ),
+            reverse('posts:profile_atom', args=['auth']): (
+                'application/atom+xml'
+            ),
+        }
+        for url, content_type in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type
+                ))
+                self.assertContains(response, 'Первый пост')
+                self.assertContains(response, 'Лев Толстой')
+
+    def test_unknown_group_and_author_are_404(self):
+        for url in [
+            reverse('posts:group_rss', args=['nope']),
+            reverse('posts:profile_atom', args=['nope']),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_items_are_capped_and_deferred(self):
+        for i in range(5):
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+        with self.settings(SYNDICATION_ITEMS=3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('posts:main_rss'))
+        self.assertEqual(response.content.count(b'<item>'), 3)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('LIMIT 3', sql)
+        self.assertNotIn('image_placeholder', sql)
+
+    def test_conditional_get_and_invalidation(self):
+        url = reverse('posts:group_rss', args=['cats'])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(
+            author=self.user, text='Второй пост', group=self.group
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Второй пост')
+
+    def test_pages_link_their_feeds(self):
+        response = self.client.get(reverse('posts:group', args=['cats']))
+        self.assertContains(
+            response, reverse('posts:group_rss', args=['cats'])
+        )
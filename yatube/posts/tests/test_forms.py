@@ -1,12 +1,15 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..forms import PostForm
 from ..models import Group, Post
@@ -132,3 +135,55 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(Post.objects.count(), post_count)
 
         self.assertRedirects(response, '/auth/login/?next=/create/')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='image.png'):
+        return self.client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name, content, 'image/png'),
+            }
+        )
+
+    def png(self, size=(60, 40)):
+        buffer = BytesIO()
+        Image.new('RGB', size, (0, 120, 0)).save(buffer, 'png')
+        return buffer.getvalue()
+
+    def test_valid_image_creates_post(self):
+        response = self.upload(self.png())
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        post = Post.objects.get(author=self.user)
+        self.assertEqual((post.image_width, post.image_height), (60, 40))
+
+    def test_rejected_uploads_show_form_error(self):
+        cases = (
+            ('не картинка', b'<html>' + b'x' * 100, {}),
+            ('обрезанный заголовок', self.png()[:20], {}),
+            ('больше лимита', self.png(),
+             {'POST_IMAGE_MAX_BYTES': 100}),
+            ('много пикселей', self.png(),
+             {'POST_IMAGE_MAX_PIXELS': 1000}),
+        )
+        for case, content, limits in cases:
+            with self.subTest(case=case), self.settings(**limits):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_rejected_file_is_not_decoded(self):
+        content = self.png((500, 500))
+        with self.settings(POST_IMAGE_MAX_PIXELS=1000), mock.patch(
+            'PIL.ImageFile.ImageFile.load'
+        ) as load:
+            self.upload(content)
+        load.assert_not_called()
@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..fragments import card_key, render_cards
+from ..models import Group, Post, User
+
+CARD = 'posts/includes/post_card.html'
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Текст поста'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def load_post(self):
+        return Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk
+        )
+
+    def test_cached_cards_are_not_rendered_again(self):
+        posts = [self.load_post()]
+        card = render_cards(posts, CARD)[0]
+        self.assertIn('Текст поста', card)
+        with mock.patch('posts.fragments.render_to_string') as render:
+            self.assertEqual(render_cards(posts, CARD), [card])
+        render.assert_not_called()
+
+    def test_card_follows_post_author_and_group_changes(self):
+        key = card_key(CARD, self.load_post())
+        post = self.load_post()
+        post.text = 'Новый текст'
+        post.save()
+        edited = card_key(CARD, self.load_post())
+        self.assertNotEqual(edited, key)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Иван'
+        user.save()
+        renamed = card_key(CARD, self.load_post())
+        self.assertNotEqual(renamed, edited)
+        self.assertIn('Иван', render_cards([self.load_post()], CARD)[0])
+
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'moved'
+        group.save()
+        self.assertNotEqual(card_key(CARD, self.load_post()), renamed)
+        self.assertIn(
+            '/group/moved/', render_cards([self.load_post()], CARD)[0]
+        )
+
+    def test_hidden_fields_do_not_touch_posts(self):
+        """Пароль, email и описание группы на карточках не видны."""
+        updated = self.load_post().updated
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('новый-пароль-123')
+        user.email = 'new@example.com'
+        user.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.description = 'Другое описание'
+        group.save()
+        self.assertEqual(self.load_post().updated, updated)
+
+    def test_card_drops_deleted_group(self):
+        render_cards([self.load_post()], CARD)
+        Group.objects.get(pk=self.group.pk).delete()
+        self.assertNotIn(
+            'Все записи группы', render_cards([self.load_post()], CARD)[0]
+        )
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, Profile
 
 User = get_user_model()
 
@@ -65,3 +65,62 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected_title = group.title
         self.assertEqual(expected_title, str(group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertProfile(self, user, **expected):
+        profile = Profile.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(profile, field), value)
+
+    def test_counters_follow_creates_and_deletes(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            author=self.reader, post=post, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertProfile(self.author, posts_count=1, followers_count=1)
+        self.assertProfile(self.reader, following_count=1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertProfile(self.author, followers_count=0)
+        self.assertProfile(self.reader, following_count=0)
+
+        post.delete()
+        self.assertProfile(self.author, posts_count=0)
+
+    def test_post_save_keeps_comments_count(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        stale_post = Post.objects.get(pk=post.pk)
+        Comment.objects.create(author=self.reader, post=post, text='Текст')
+        stale_post.text = 'Новый текст'
+        stale_post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(post.comments_count, 1)
+
+    def test_drifted_counters_do_not_go_below_zero(self):
+        """Пост и комментарий из bulk_create счётчики не увеличили."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text='Мимо сигналов')]
+        )
+        post = Post.objects.get(text='Мимо сигналов')
+        Comment.objects.bulk_create(
+            [Comment(author=self.reader, post=post, text='Тоже мимо')]
+        )
+        Comment.objects.get(post=post).delete()
+        post.delete()
+        self.assertProfile(self.author, posts_count=0)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+
+from ..models import Group, Post, User
+from ..objects import get_cached_or_404, group_cache, post_cache, user_cache
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_lookup_skips_database(self):
+        with self.assertNumQueries(1):
+            group_cache.get(slug='group')
+        with self.assertNumQueries(0):
+            self.assertEqual(group_cache.get(slug='group'), self.group)
+            self.assertEqual(group_cache.get(pk=self.group.pk), self.group)
+
+    def test_get_many_loads_misses_in_one_query(self):
+        pks = [post.pk for post in self.posts]
+        post_cache.get(pk=pks[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(set(post_cache.get_many(pks)), set(pks))
+        with self.assertNumQueries(0):
+            post_cache.get_many(pks)
+
+    def test_save_and_rename_invalidate(self):
+        user_cache.get(username='auth')
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'renamed'
+        user.save()
+        self.assertEqual(
+            user_cache.get(username='renamed').username, 'renamed'
+        )
+        with self.assertRaises(User.DoesNotExist):
+            user_cache.get(username='auth')
+
+        post = post_cache.get(pk=self.posts[0].pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(
+            post_cache.get(pk=self.posts[0].pk).text, 'Новый текст'
+        )
+
+    def test_get_cached_or_404(self):
+        with self.assertRaises(Http404):
+            get_cached_or_404(group_cache, slug='missing')
+        Group.objects.get(pk=self.group.pk).delete()
+        with self.assertRaises(Http404):
+            get_cached_or_404(group_cache, pk=self.group.pk)
@@ -0,0 +1,76 @@
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..admin import PostAdmin
+from ..models import Group, Post, User
+from ..search import match_expression, search_posts
+
+
+class PostSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Котики', slug='cats', description='Описание'
+        )
+        self.cat = Post.objects.create(
+            author=self.user, text='Пушистый кот спит на <b>диване</b>'
+        )
+        self.dog = Post.objects.create(
+            author=self.user, text='Собака гуляет', group=self.group
+        )
+
+    def ids(self, query):
+        return [post.pk for post, _ in search_posts(query)[0]]
+
+    def test_index_follows_posts_and_groups(self):
+        self.assertEqual(self.ids('спит'), [self.cat.pk])
+        self.assertEqual(self.ids('котики'), [self.dog.pk])
+        self.dog.text = 'Собака спит'
+        self.dog.save()
+        self.assertCountEqual(self.ids('спит'), [self.cat.pk, self.dog.pk])
+        self.group.title = 'Собаки'
+        self.group.save()
+        self.assertEqual(self.ids('котики'), [])
+        self.cat.delete()
+        self.assertEqual(self.ids('пушистый'), [])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        (_, snippet), = search_posts('диване')[0]
+        self.assertIn('<mark>диване</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_operators_in_query_are_literal(self):
+        self.assertEqual(match_expression('кот OR "собака'),
+                         '"кот" "or" "собака"*')
+        self.assertEqual(search_posts('* ) NEAR(')[0], [])
+
+    def test_keyset_pages_cover_all_results(self):
+        for i in range(5):
+            Post.objects.create(author=self.user, text=f'Кот номер {i}')
+        seen, token = [], None
+        while True:
+            results, token = search_posts('номер', token, per_page=2)
+            seen += [post.pk for post, _ in results]
+            if token is None:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_search_view(self):
+        response = Client().get(reverse('posts:search'), {'q': 'собака'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post for post, _ in response.context['results']], [self.dog]
+        )
+
+    def test_admin_search_uses_index(self):
+        request = RequestFactory().get('/admin/posts/post/')
+        queryset, duplicates = PostAdmin(Post, site).get_search_results(
+            request, Post.objects.all(), 'пушист'
+        )
+        self.assertFalse(duplicates)
+        self.assertIn('posts_post_fts', str(queryset.query))
+        self.assertEqual(list(queryset), [self.cat])
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, PostTag, Tag, User
+from ..tags import extract_tags
+
+
+class HashtagTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client = Client()
+
+    def tag_names(self, post):
+        return set(post.tag_entries.values_list('tag__name', flat=True))
+
+    def test_extract_tags(self):
+        self.assertEqual(
+            extract_tags('#Кот и #кот, #dog_2 но не a#b и не ##x'),
+            {'кот', 'dog_2'}
+        )
+        self.assertEqual(
+            extract_tags(f'#{"a" * 50} #{"b" * 51}'), {'a' * 50}
+        )
+
+    def test_index_follows_post_text(self):
+        post = Post.objects.create(author=self.user, text='Пост #кот #пёс')
+        self.assertEqual(self.tag_names(post), {'кот', 'пёс'})
+        entry = PostTag.objects.filter(post=post).first()
+        self.assertEqual(entry.pub_date, post.pub_date)
+        post.text = 'Пост #кот #птица'
+        post.save()
+        self.assertEqual(self.tag_names(post), {'кот', 'птица'})
+        post.delete()
+        self.assertFalse(PostTag.objects.exists())
+
+    def test_tag_feed_shows_new_posts(self):
+        Post.objects.create(author=self.user, text='Первый #кот')
+        url = reverse('posts:tag', args=['кот'])
+        self.assertEqual(len(self.client.get(url).context['page_obj']), 1)
+        Post.objects.create(author=self.user, text='Второй #кот')
+        Post.objects.create(author=self.user, text='Без тега')
+        response = self.client.get(url)
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Второй #кот', 'Первый #кот']
+        )
+        self.assertContains(response, f'href="{url}"')
+
+    def test_tag_feed_cursor_pages(self):
+        for i in range(12):
+            Post.objects.create(author=self.user, text=f'Пост {i} #кот')
+        url = reverse('posts:tag', args=['кот'])
+        page = self.client.get(url, {'cursor': ''}).context['page_obj']
+        second = self.client.get(url, {'cursor': page.older_cursor})
+        self.assertEqual(len(page) + len(second.context['page_obj']), 12)
+
+    def test_unknown_tag_is_404_and_case_redirects(self):
+        self.assertEqual(
+            self.client.get(reverse('posts:tag', args=['нет'])).status_code,
+            404
+        )
+        response = self.client.get(reverse('posts:tag', args=['КОТ']))
+        self.assertRedirects(
+            response, reverse('posts:tag', args=['кот']),
+            fetch_redirect_response=False
+        )
+
+    def test_backfill_indexes_existing_posts(self):
+        post = Post.objects.create(author=self.user, text='Пост #кот')
+        PostTag.objects.all().delete()
+        Tag.objects.all().delete()
+        call_command('backfill_tags', batch_size=1, stdout=StringIO())
+        call_command('backfill_tags', stdout=StringIO())
+        self.assertEqual(self.tag_names(post), {'кот'})
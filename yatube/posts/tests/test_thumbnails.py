@@ -0,0 +1,283 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..fragments import render_cards
+from ..models import Post, User
+from ..thumbnails import get_existing_thumbnail, prefetch_thumbnails
+from ..variants import (FORMATS, available_formats, generate_variants,
+                        variant_name)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='image.png', color=(200, 0, 0)):
+    buffer = BytesIO()
+    Image.new('RGB', (60, 40), color).save(buffer, 'png')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def run_now(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def load_post(self, pk):
+        return Post.objects.select_related('author', 'group').get(pk=pk)
+
+    def test_card_shows_placeholder_until_thumbnails_exist(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        self.assertIsNone(get_existing_thumbnail(post.image, 'card'))
+        card = render_cards([self.load_post(post.pk)],
+                            'posts/includes/post_card.html')[0]
+        self.assertNotIn('<img', card)
+        self.assertIn('bg-light', card)
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_thumbnails_generated_after_upload(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        post = self.load_post(post.pk)
+        for size in settings.POST_THUMBNAILS:
+            with self.subTest(size=size):
+                self.assertIsNotNone(get_existing_thumbnail(post.image, size))
+        card = render_cards([post], 'posts/includes/post_card.html')[0]
+        self.assertIn('<img', card)
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_edit_without_new_image_is_not_scheduled(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        with mock.patch('posts.thumbnails.submit') as submit:
+            post.text = 'Новый текст'
+            post.save()
+        submit.assert_not_called()
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_page_thumbnails_loaded_in_one_query(self):
+        for i in range(3):
+            Post.objects.create(
+                author=self.user, text=f'Пост {i}',
+                image=make_image(f'image_{i}.png')
+            )
+        Post.objects.create(author=self.user, text='Без картинки')
+        # Посты, загруженные до появления вариантов для srcset
+        Post.objects.update(image_variants='')
+        cache.clear()
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts, 'card')
+        self.assertEqual(
+            sum(post.thumbnails['card'] is not None
+                for post in posts if post.image),
+            3
+        )
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(posts, 'card')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ImageVariantsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def test_variants_not_wider_than_source(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        variants = generate_variants(post.image.name)
+        widths = {variant.split('w.')[0] for variant in variants.split()}
+        self.assertEqual(widths, {'60'})
+        for format_name in available_formats():
+            with self.subTest(format_name=format_name):
+                self.assertIn(f'60w.{FORMATS[format_name][0]}', variants)
+
+    def test_command_skips_broken_images(self):
+        good = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        broken = Post.objects.create(
+            author=self.user, text='Пост',
+            image=make_image(color=(0, 0, 200))
+        )
+        with open(broken.image.path, 'wb') as file:
+            file.write(b'not an image')
+        Post.objects.update(image_variants='')
+        stderr = StringIO()
+        call_command(
+            'generate_image_variants', workers=1,
+            stdout=StringIO(), stderr=stderr
+        )
+        good.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertIn('60w.jpg', good.image_variants)
+        self.assertEqual(broken.image_variants, '')
+        self.assertIn(f'Пост {broken.pk}', stderr.getvalue())
+
+    def test_variant_names_depend_on_full_image_name(self):
+        names = {
+            variant_name(image, 480, 'jpg')
+            for image in ('posts/cat.jpg', 'posts/cat.png', 'other/cat.jpg')
+        }
+        self.assertEqual(len(names), 3)
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_card_renders_srcset(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 800)).save(buffer, 'jpeg')
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('wide.jpg', buffer.getvalue())
+        )
+        post = Post.objects.select_related('author', 'group').get(
+            pk=post.pk
+        )
+        card = render_cards([post], 'posts/includes/post_card.html')[0]
+        self.assertIn('<picture>', card)
+        self.assertIn('_320w.jpg 320w', card)
+        self.assertIn('_1000w.jpg 1000w', card)
+        self.assertIn('sizes="(max-width: 576px) 100vw, 400px"', card)
+        self.assertEqual('image/webp' in card, 'WEBP' in available_formats())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ImageMetadataTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def test_metadata_extracted_on_upload(self):
+        image = make_image()
+        post = Post.objects.create(author=self.user, text='Пост', image=image)
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (60, 40))
+        self.assertEqual(post.image_size, image.size)
+        self.assertEqual(post.image_color, '#c80000')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+
+    def test_edit_without_new_image_keeps_metadata(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        with mock.patch('posts.metadata.extract_metadata') as extract:
+            post.text = 'Новый текст'
+            post.save()
+        extract.assert_not_called()
+        post.refresh_from_db()
+        self.assertEqual(post.image_width, 60)
+
+    def test_card_placeholder_uses_color(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        post = Post.objects.select_related('author', 'group').get(
+            pk=post.pk
+        )
+        card = render_cards([post], 'posts/includes/post_card.html')[0]
+        self.assertIn('background: #c80000 url(data:image/jpeg', card)
+
+    def test_backfill_fills_missing_metadata(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        Post.objects.update(image_width=None, image_height=None,
+                            image_color='', image_placeholder='')
+        call_command('backfill_image_metadata', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (60, 40))
+        self.assertEqual(post.image_color, '#c80000')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def test_same_image_stored_once(self):
+        first = Post.objects.create(
+            author=self.user, text='Пост', image=make_image('first.png')
+        )
+        second = Post.objects.create(
+            author=self.user, text='Пост', image=make_image('second.png')
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory),
+                         [os.path.basename(first.image.name)])
+
+    def test_reused_orphan_is_protected_by_min_age(self):
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/orphan.png', make_image(color=(0, 90, 0)))
+        two_hours_ago = os.path.getmtime(storage.path(name)) - 2 * 60 * 60
+        os.utime(storage.path(name), (two_hours_ago, two_hours_ago))
+        self.assertEqual(
+            storage.save('posts/again.png', make_image(color=(0, 90, 0))),
+            name
+        )
+        call_command('collect_media_garbage', stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_duplicate_reuses_variants(self):
+        first = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        with mock.patch('posts.thumbnails.generate_variants') as generate:
+            second = Post.objects.create(
+                author=self.user, text='Пост', image=make_image()
+            )
+        generate.assert_not_called()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.image_variants, first.image_variants)
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_garbage_collection_keeps_referenced_files(self):
+        kept = Post.objects.create(
+            author=self.user, text='Пост', image=make_image()
+        )
+        buffer = BytesIO()
+        Image.new('RGB', (30, 30), (0, 0, 200)).save(buffer, 'png')
+        removed = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('blue.png', buffer.getvalue())
+        )
+        removed_name = removed.image.name
+        removed.delete()
+        call_command('collect_media_garbage', min_age=0, stdout=StringIO())
+        storage = kept.image.storage
+        self.assertFalse(storage.exists(removed_name))
+        self.assertTrue(storage.exists(kept.image.name))
+        self.assertTrue(storage.exists(
+            variant_name(kept.image.name, 60, 'jpg')
+        ))
+        self.assertFalse(storage.exists(
+            variant_name(removed_name, 30, 'jpg')
+        ))
@@ -1,10 +1,14 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from ..caching import FEEDS_SCOPE, get_generations
 from ..forms import PostForm
-from ..models import Comment, Group, Post
+from ..models import Comment, FeedEntry, Follow, Group, Post
+from ..utils import get_page_window
 
 User = get_user_model()
 
@@ -166,6 +170,47 @@ class PostViewsTest(TestCase):
             f'/auth/login/?next=/posts/{PostViewsTest.post.id}/comment/'
         )
 
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_paged_by_cursor(self):
+        post = Post.objects.create(text='Пост', author=PostViewsTest.user)
+        comments = [
+            Comment.objects.create(
+                post=post, author=self.user, text=f'Комментарий {i}'
+            )
+            for i in range(5)
+        ]
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertEqual(response.context['post_comments'], comments[:2])
+        cursor = response.context['comments_cursor']
+        self.assertIsNotNone(cursor)
+
+        url = reverse('posts:post_comments', kwargs={'post_id': post.id})
+        response = self.guest_client.get(url, {'comments': cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(response.context['post_comments'], comments[2:4])
+        response = self.guest_client.get(
+            url, {'comments': response.context['comments_cursor']}
+        )
+        self.assertEqual(response.context['post_comments'], comments[4:])
+        self.assertIsNone(response.context['comments_cursor'])
+
+    def test_post_detail_query_count_independent_of_comments(self):
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': PostViewsTest.post.id}
+        )
+        for i in range(3):
+            author = User.objects.create_user(username=f'commenter_{i}')
+            Comment.objects.create(
+                post=PostViewsTest.post, author=author, text='Комментарий'
+            )
+        self.guest_client.get(url)
+        # Пост, автор и группа из кэша объектов: профиль и комментарии
+        with self.assertNumQueries(2):
+            self.guest_client.get(url)
+
     def test_cache_index(self):
         '''Проверка кэша главной страницы.'''
         post = Post.objects.create(
@@ -175,7 +220,7 @@ class PostViewsTest(TestCase):
         )
         response = self.author_client.get(reverse('posts:main'))
         posts = response.content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Обход сигналов')
         response_1 = self.author_client.get(reverse('posts:main'))
         posts_1 = response_1.content
         self.assertEqual(posts_1, posts)
@@ -184,6 +229,52 @@ class PostViewsTest(TestCase):
         posts_2 = response_2.content
         self.assertNotEqual(posts_1, posts_2)
 
+    def test_feed_cache_invalidated_by_generation(self):
+        '''Изменение поста сразу сбрасывает кэш всех его лент.'''
+        urls = [
+            reverse('posts:main'),
+            reverse('posts:group', kwargs={'slug': PostViewsTest.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': PostViewsTest.user}
+            ),
+        ]
+        post = Post.objects.create(
+            text='Пост, который удалят',
+            author=PostViewsTest.user,
+            group=PostViewsTest.group
+        )
+        for url in urls:
+            self.assertContains(self.guest_client.get(url), post.text)
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url), post.text)
+
+    def test_group_change_invalidates_previous_group(self):
+        post = Post.objects.create(
+            text='Пост, который переедет',
+            author=PostViewsTest.user,
+            group=PostViewsTest.group
+        )
+        url = reverse('posts:group', kwargs={'slug': PostViewsTest.group.slug})
+        self.assertContains(self.guest_client.get(url), post.text)
+        post.group = None
+        post.save()
+        self.assertNotContains(self.guest_client.get(url), post.text)
+
+    def test_only_card_fields_of_user_invalidate_feeds(self):
+        def generation():
+            return get_generations([FEEDS_SCOPE])[0]
+
+        before = generation()
+        user = User.objects.create_user(username='newcomer')
+        user.set_password('секрет-123')
+        user.save()
+        self.assertEqual(generation(), before)
+        user.first_name = 'Имя'
+        user.save()
+        self.assertNotEqual(generation(), before)
+
 
 class PaginatorViewsTest(TestCase):
     """Тестирование пагинатора"""
@@ -206,6 +297,7 @@ class PaginatorViewsTest(TestCase):
 
     def setUp(self):
         """Неавторизованный юзер"""
+        cache.clear()
         self.guest_client = Client()
 
         """Авторизованный юзер"""
@@ -245,3 +337,185 @@ class PaginatorViewsTest(TestCase):
                     self.assertEqual(
                         len(response.context['page_obj']), count
                     )
+
+    def test_page_window(self):
+        response = self.guest_client.get(reverse('posts:main'), {'page': 2})
+        self.assertEqual(response.context['page_obj'].page_window, [1, 2])
+
+        window_by_page = {
+            1: [1, 2, 3, None, 100],
+            50: [1, None, 48, 49, 50, 51, 52, None, 100],
+            100: [1, None, 98, 99, 100],
+        }
+        for number, window in window_by_page.items():
+            with self.subTest(number=number):
+                self.assertEqual(get_page_window(number, 100), window)
+
+    def test_cursor_paginator_in_page_and_count(self):
+        """Курсорный режим: старше/новее возвращают те же записи."""
+        list_pag = [
+            reverse('posts:main'),
+            reverse(
+                'posts:group',
+                kwargs={'slug': PaginatorViewsTest.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': PaginatorViewsTest.post.author}
+            )
+        ]
+        for url in list_pag:
+            with self.subTest(url=url):
+                cache.clear()
+                first = self.guest_client.get(url, {'cursor': ''})
+                first_page = first.context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                self.assertTrue(first_page.has_next())
+
+                older = self.guest_client.get(
+                    url, {'cursor': first_page.older_cursor}
+                )
+                older_page = older.context['page_obj']
+                self.assertEqual(len(older_page), 3)
+                self.assertFalse(older_page.has_next())
+
+                newer = self.guest_client.get(
+                    url, {'cursor': older_page.newer_cursor}
+                )
+                self.assertEqual(
+                    list(newer.context['page_obj']), list(first_page)
+                )
+
+    def test_cursor_paginator_follow_index(self):
+        Follow.objects.create(
+            user=self.user, author=PaginatorViewsTest.user
+        )
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), {'cursor': 'битый курсор'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class FollowFeedViewsTest(TestCase):
+    """Материализованная лента подписок"""
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_feed_posts(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        self.assertEqual(self.get_feed_posts(), [])
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+        self.assertEqual(self.get_feed_posts(), [FollowFeedViewsTest.post])
+
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            self.get_feed_posts(), [new_post, FollowFeedViewsTest.post]
+        )
+
+    def test_unfollow_prunes_feed(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        self.assertEqual(self.get_feed_posts(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=2, POSTS_PER_PAGE=3)
+    def test_hybrid_feed_merges_pushed_and_pulled_posts(self):
+        """Популярный автор читается из кэша, обычный — из FeedEntry."""
+        small_author = User.objects.create_user(username='small')
+        another_reader = User.objects.create_user(username='another')
+        Follow.objects.create(user=another_reader, author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=small_author)
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f'Популярный {i}')
+            Post.objects.create(author=small_author, text=f'Обычный {i}')
+
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.user, post__author=self.author
+        ).exists())
+        expected = list(Post.objects.filter(
+            author__following__user=self.user
+        ).order_by('-pub_date', '-pk'))
+
+        pages = []
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), {'cursor': ''}
+        )
+        while True:
+            page_obj = response.context['page_obj']
+            pages.extend(page_obj)
+            if not page_obj.has_next():
+                break
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'),
+                {'cursor': page_obj.older_cursor}
+            )
+        self.assertEqual(pages, expected)
+
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), {'page': 2}
+        )
+        self.assertEqual(list(response.context['page_obj']), expected[3:6])
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=2)
+    @mock.patch('posts.feed.transaction.on_commit', lambda func: func())
+    def test_pull_era_posts_survive_return_to_push(self):
+        another_reader = User.objects.create_user(username='another')
+        Follow.objects.create(user=self.user, author=self.author)
+        follow = Follow.objects.create(
+            user=another_reader, author=self.author
+        )
+        pulled = Post.objects.create(author=self.author, text='Из кэша')
+        self.assertIn(pulled, self.get_feed_posts())
+        follow.delete()
+        self.assertEqual(
+            self.get_feed_posts(), [pulled, FollowFeedViewsTest.post]
+        )
+        self.assertFalse(FeedEntry.objects.filter(
+            user=another_reader
+        ).exists())
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=3, TIMELINE_PUSH_RATIO=0.5)
+    @mock.patch('posts.feed.transaction.on_commit', lambda func: func())
+    def test_return_to_push_waits_below_ratio(self):
+        """Отписка у самого порога не раскладывает посты заново."""
+        readers = [
+            User.objects.create_user(username=f'reader{i}') for i in range(2)
+        ]
+        Follow.objects.create(user=self.user, author=self.author)
+        follows = [
+            Follow.objects.create(user=reader, author=self.author)
+            for reader in readers
+        ]
+        pulled = Post.objects.create(author=self.author, text='Из кэша')
+        with mock.patch('posts.feed.return_to_push') as return_to_push:
+            follows[0].delete()
+            Follow.objects.create(user=readers[0], author=self.author)
+            follows[1].delete()
+        return_to_push.assert_not_called()
+        self.assertFalse(FeedEntry.objects.filter(post=pulled).exists())
+        self.assertIn(pulled, self.get_feed_posts())
+
+        Follow.objects.filter(author=self.author).exclude(
+            user=self.user
+        ).delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=pulled
+        ).exists())
@@ -0,0 +1,181 @@
+"""Миниатюры картинок постов, которые готовятся заранее в фоне.
+
+После сохранения поста с новой картинкой пул потоков создаёт
+миниатюры всех размеров из POST_THUMBNAILS и варианты для srcset
+(см. posts.variants). Шаблоны только читают
+готовую миниатюру из хранилища sorl-thumbnail и, пока её нет,
+показывают заглушку: рендер ленты не ждёт Pillow.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (EMPTY_VALUE,
+                                                       KVStore as
+                                                       CachedDbKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+from .variants import generate_variants
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ExistingThumbnailBackend(ThumbnailBackend):
+    """Находит миниатюру так же, как get_thumbnail, но не создаёт её."""
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_existing(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, options)
+        )
+
+
+backend = ExistingThumbnailBackend()
+
+
+def get_existing_thumbnail(image, size):
+    """Готовая миниатюра размера size из POST_THUMBNAILS или None."""
+    if not image:
+        return None
+    geometry, options = settings.POST_THUMBNAILS[size]
+    return backend.get_existing(image, geometry, **options)
+
+
+def get_existing_thumbnails(images, size):
+    """Готовые миниатюры нескольких картинок по их именам: один
+    get_many к кэшу sorl-thumbnail и один запрос к базе на промахи
+    вместо обращения на каждую картинку."""
+    geometry, options = settings.POST_THUMBNAILS[size]
+    files = {
+        image.name: backend.thumbnail_file(image, geometry, dict(options))
+        for image in images if image
+    }
+    if not isinstance(default.kvstore, CachedDbKVStore):
+        return {
+            name: default.kvstore.get(thumbnail)
+            for name, thumbnail in files.items()
+        }
+    names = {add_prefix(thumbnail.key): name
+             for name, thumbnail in files.items()}
+    kv_cache = default.kvstore.cache
+    found = kv_cache.get_many(names)
+    missing = [key for key in names if key not in found]
+    if missing:
+        loaded = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        # Отсутствие тоже кэшируется, как в самом KVStore
+        loaded = {key: loaded.get(key, EMPTY_VALUE) for key in missing}
+        kv_cache.set_many(loaded, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(loaded)
+    return {
+        names[key]: (
+            None if value == EMPTY_VALUE else deserialize_image_file(value)
+        )
+        for key, value in found.items()
+    }
+
+
+def prefetch_thumbnails(posts, size):
+    """Кладёт готовые миниатюры в post.thumbnails для тега
+    post_thumbnail. Постам с вариантами для srcset они не нужны."""
+    posts = [
+        post for post in posts if post.image and not post.image_variants
+    ]
+    thumbnails = get_existing_thumbnails(
+        [post.image for post in posts], size
+    )
+    for post in posts:
+        post.thumbnails = {
+            **getattr(post, 'thumbnails', {}),
+            size: thumbnails.get(post.image.name),
+        }
+
+
+def generate_thumbnails(post_id):
+    """Создаёт все миниатюры и варианты для srcset и сохраняет пост,
+    чтобы карточки и страницы с заглушкой отрисовались заново.
+    Готовые миниатюры sorl-thumbnail находит сам по имени картинки."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        get_thumbnail(post.image, geometry, **options)
+    # Та же картинка у другого поста: варианты уже созданы
+    shared = Post.objects.filter(image=post.image.name).exclude(
+        image_variants=''
+    ).values_list('image_variants', flat=True).first()
+    post.image_variants = shared or generate_variants(post.image.name)
+    post.save(update_fields=['image_variants', 'updated'])
+
+
+def _generate(post_id):
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+
+
+def _run(post_id):
+    try:
+        _generate(post_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.POST_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def use_pool():
+    """SQLite в памяти потоки делят с блокировками целых таблиц, и
+    фоновые записи мешали бы запросам: тогда миниатюры создаются сразу."""
+    if not settings.POST_THUMBNAIL_WORKERS:
+        return False
+    return not (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def submit(post_id):
+    if use_pool():
+        get_executor().submit(_run, post_id)
+    else:
+        _generate(post_id)
+
+
+def schedule(post_id):
+    """Ставит пост в очередь после фиксации транзакции."""
+    transaction.on_commit(partial(submit, post_id))
@@ -0,0 +1,185 @@
+"""Гибридная лента подписок: push для обычных авторов, pull для популярных.
+
+Посты авторов в режиме push раскладываются по лентам при записи
+(см. posts.feed). Для популярных авторов (Profile.pull_timeline) в кэше
+хранится ограниченный список последних постов, и при чтении он
+сливается с материализованной лентой k-путевым слиянием через кучу.
+Режим переключает posts.feed.update_mode.
+"""
+import heapq
+from itertools import dropwhile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Post, Profile
+from .utils import CURSOR_OLDER
+
+PULL_KEY = 'timeline:pull:{}'
+AUTHOR_TIMELINE_KEY = 'timeline:author:{}'
+
+
+def get_pull_authors(author_ids):
+    """Авторы в режиме pull; промахи кэша — одним запросом."""
+    keys = {PULL_KEY.format(pk): pk for pk in author_ids}
+    cached = cache.get_many(keys)
+    flags = {keys[key]: value for key, value in cached.items()}
+    missing = [pk for pk in author_ids if pk not in flags]
+    if missing:
+        loaded = dict.fromkeys(missing, False)
+        loaded.update(
+            Profile.objects.filter(user_id__in=missing).values_list(
+                'user_id', 'pull_timeline'
+            )
+        )
+        cache.set_many(
+            {PULL_KEY.format(pk): flag for pk, flag in loaded.items()},
+            settings.TIMELINE_CACHE_TIMEOUT
+        )
+        flags.update(loaded)
+    return {pk for pk, flag in flags.items() if flag}
+
+
+def is_pull_author(author_id):
+    return author_id in get_pull_authors([author_id])
+
+
+def invalidate_pull_flag(author_id):
+    cache.delete(PULL_KEY.format(author_id))
+
+
+def reset_pull_flags():
+    """Режимы всех авторов по текущему порогу, без гистерезиса: для
+    замеров и после ручной правки порога."""
+    threshold = settings.TIMELINE_PULL_THRESHOLD
+    Profile.objects.filter(followers_count__gte=threshold).update(
+        pull_timeline=True
+    )
+    Profile.objects.filter(followers_count__lt=threshold).update(
+        pull_timeline=False
+    )
+    cache.delete_many([
+        PULL_KEY.format(pk)
+        for pk in Profile.objects.values_list('user_id', flat=True)
+    ])
+
+
+def get_author_timelines(author_ids):
+    """Последние посты авторов как списки (pub_date, pk), новые первыми."""
+    keys = {AUTHOR_TIMELINE_KEY.format(pk): pk for pk in author_ids}
+    cached = cache.get_many(keys)
+    timelines = {keys[key]: value for key, value in cached.items()}
+    loaded = {}
+    for pk in author_ids:
+        if pk not in timelines:
+            loaded[pk] = list(
+                Post.objects.filter(author_id=pk).order_by(
+                    '-pub_date', '-pk'
+                ).values_list('pub_date', 'pk')[
+                    :settings.TIMELINE_AUTHOR_LENGTH
+                ]
+            )
+    if loaded:
+        cache.set_many(
+            {
+                AUTHOR_TIMELINE_KEY.format(pk): items
+                for pk, items in loaded.items()
+            },
+            settings.TIMELINE_CACHE_TIMEOUT
+        )
+        timelines.update(loaded)
+    return timelines
+
+
+def invalidate_author_timeline(author_id):
+    cache.delete(AUTHOR_TIMELINE_KEY.format(author_id))
+
+
+def merge_timelines(streams, limit, reverse=True):
+    """k-путевое слияние отсортированных потоков (pub_date, pk) без
+    повторов. Пост может попасть в оба источника, пока автор
+    переходит между push и pull."""
+    seen = set()
+    merged = []
+    for item in heapq.merge(*streams, reverse=reverse):
+        if item[1] in seen:
+            continue
+        seen.add(item[1])
+        merged.append(item)
+        if len(merged) == limit:
+            break
+    return merged
+
+
+class Timeline:
+    """Лента подписок читателя в виде последовательности постов.
+
+    Поддерживает срезы и count() для Paginator и keyset() для
+    курсорного режима paginate_page.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        author_ids = list(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+        pull_ids = get_pull_authors(author_ids)
+        self.pulled = list(get_author_timelines(pull_ids).values())
+        self.entries = FeedEntry.objects.filter(user=user).order_by(
+            '-pub_date', '-post_id'
+        ).values_list('pub_date', 'post_id')
+
+    def count(self):
+        return self.entries.count() + sum(map(len, self.pulled))
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            stop = self.count()
+        items = merge_timelines(
+            [self.entries[:stop]] + self.pulled, stop
+        )
+        return self.hydrate(items[start:])
+
+    def keyset(self, cursor, limit):
+        """Записи старше или новее курсора (direction, pub_date, pk)."""
+        if cursor is None:
+            return self[:limit]
+        direction, pub_date, pk = cursor
+        key = (pub_date, pk)
+        if direction == CURSOR_OLDER:
+            entries = self.entries.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, post_id__lt=pk)
+            )[:limit]
+            pulled = [
+                dropwhile(lambda item: item >= key, timeline)
+                for timeline in self.pulled
+            ]
+            items = merge_timelines([entries] + pulled, limit)
+        else:
+            entries = self.entries.filter(
+                Q(pub_date__gt=pub_date)
+                | Q(pub_date=pub_date, post_id__gt=pk)
+            ).order_by('pub_date', 'post_id')[:limit]
+            pulled = [
+                dropwhile(lambda item: item <= key, reversed(timeline))
+                for timeline in self.pulled
+            ]
+            items = merge_timelines([entries] + pulled, limit, reverse=False)
+        return self.hydrate(items)
+
+    @staticmethod
+    def hydrate(items):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for _, pk in items]
+        )
+        return [posts[pk] for _, pk in items if pk in posts]
@@ -0,0 +1,150 @@
+"""Потоковый приём картинки поста с ранней проверкой.
+
+ImageUploadHandler пишет поле image во временный файл по частям и по
+первым байтам определяет формат и размеры из заголовка. Слишком
+большой файл, слишком много пикселей или не картинка отбрасываются
+сразу: остаток тела запроса дочитывается без записи и без Pillow, а
+PostForm получает причину отказа из RejectedUpload.
+"""
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (TemporaryUploadedFile,
+                                            UploadedFile)
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             StopFutureHandlers)
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+IMAGE_FIELD = 'image'
+# Заголовок с размерами ищется не дальше этого числа байт
+HEADER_LIMIT = 256 * 1024
+# Сигнатуры форматов, которые принимаются в посты
+SIGNATURES = (
+    ('JPEG', 0, b'\xff\xd8\xff'),
+    ('PNG', 0, b'\x89PNG\r\n\x1a\n'),
+    ('GIF', 0, b'GIF87a'),
+    ('GIF', 0, b'GIF89a'),
+    ('WEBP', 8, b'WEBP'),
+)
+
+
+def sniff_format(head):
+    """Формат по первым байтам файла или None."""
+    for format_name, offset, signature in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if format_name == 'WEBP' and not head.startswith(b'RIFF'):
+                continue
+            return format_name
+    return None
+
+
+def read_header_size(head):
+    """Размеры из заголовка или None, если заголовок ещё не получен
+    целиком. Пиксели при этом не декодируются."""
+    try:
+        with Image.open(BytesIO(head)) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+class RejectedUpload(UploadedFile):
+    """Пустая замена отброшенного файла с причиной для формы."""
+
+    def __init__(self, name, error):
+        super().__init__(BytesIO(), name, size=0)
+        self.upload_error = error
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Принимает поле image во временный файл с проверками на лету.
+    Остальные поля передаёт следующим обработчикам."""
+
+    def new_file(self, field_name, *args, **kwargs):
+        self.active = field_name == IMAGE_FIELD
+        if not self.active:
+            return
+        super().new_file(field_name, *args, **kwargs)
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra
+        )
+        self.head = b''
+        self.size = None
+        self.error = None
+        raise StopFutureHandlers()
+
+    def reject(self, error):
+        self.error = error
+        self.head = b''
+        self.file.close()
+
+    def check(self, received):
+        if received > settings.POST_IMAGE_MAX_BYTES:
+            limit = settings.POST_IMAGE_MAX_BYTES // (1024 * 1024)
+            return f'Файл больше {limit} МБ.'
+        if self.size is not None:
+            return None
+        if len(self.head) >= 12 and sniff_format(self.head) is None:
+            return 'Загрузите картинку в формате JPEG, PNG, GIF или WebP.'
+        try:
+            self.size = read_header_size(self.head)
+        except Image.DecompressionBombError:
+            return 'Картинка слишком большая.'
+        if self.size is not None:
+            width, height = self.size
+            if width * height > settings.POST_IMAGE_MAX_PIXELS:
+                return (
+                    f'Картинка {width}×{height} слишком большая: не больше '
+                    f'{settings.POST_IMAGE_MAX_PIXELS} пикселей.'
+                )
+            self.head = b''
+        elif len(self.head) >= HEADER_LIMIT:
+            return 'Не удалось прочитать размеры картинки.'
+        return None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.error is not None:
+            return None
+        if self.size is None:
+            self.head += raw_data[:HEADER_LIMIT - len(self.head)]
+        error = self.check(start + len(raw_data))
+        if error is not None:
+            self.reject(error)
+            return None
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        if self.error is None and self.size is None:
+            # Файл короче заголовка: проверяется то, что пришло
+            self.error = self.check(file_size) or (
+                'Загрузите картинку в формате JPEG, PNG, GIF или WebP.'
+            )
+            self.file.close()
+        if self.error is not None:
+            return RejectedUpload(self.file_name, self.error)
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+
+def stream_image_uploads(view):
+    """Ставит ImageUploadHandler первым обработчиком. CSRF проверяется
+    внутри, после подмены: middleware иначе прочитал бы тело раньше."""
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        return protected(request, *args, **kwargs)
+    return wrapper
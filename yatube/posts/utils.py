@@ -1,8 +1,189 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+
+PAGINATION_NUMBERED = 'numbered'
+PAGINATION_CURSOR = 'cursor'
+
+CURSOR_OLDER = 'o'
+CURSOR_NEWER = 'n'
+
+PAGE_WINDOW_ON_EACH_SIDE = 2
+PAGE_WINDOW_ON_ENDS = 1
+
+
+class CursorPage:
+    """Страница ленты, выбранная по курсору (pub_date, id).
+
+    Повторяет ту часть интерфейса Page, которой пользуются шаблоны,
+    но не знает ни номера страницы, ни общего количества записей.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, newer_cursor=None, older_cursor=None):
+        self.object_list = object_list
+        self.newer_cursor = newer_cursor
+        self.older_cursor = older_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.older_cursor is not None
+
+    def has_previous(self):
+        return self.newer_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+def encode_cursor(direction, obj, field='pub_date'):
+    """obj — объект модели или строка values() с полями field и id."""
+    if isinstance(obj, dict):
+        value, pk = obj[field], obj['id']
+    else:
+        value, pk = getattr(obj, field), obj.pk
+    raw = f'{direction}{value.isoformat()}|{pk}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (direction, pub_date, pk) или None для битого курсора."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = urlsafe_b64decode(padded.encode()).decode()
+        direction, raw = raw[0], raw[1:]
+        pub_date, pk = raw.rsplit('|', 1)
+        if direction not in (CURSOR_OLDER, CURSOR_NEWER):
+            return None
+        return direction, datetime.fromisoformat(pub_date), int(pk)
+    except (BinasciiError, UnicodeDecodeError, ValueError, IndexError):
+        return None
+
+
+def paginate_cursor(post_list, token, per_page):
+    """Одна выборка по индексу: записи старше или новее курсора.
+
+    Вместо QuerySet можно передать объект с методом keyset(cursor, limit),
+    возвращающим записи в порядке обхода от курсора.
+    """
+    cursor = decode_cursor(token) if token else None
+    if hasattr(post_list, 'keyset'):
+        direction = cursor[0] if cursor else CURSOR_OLDER
+        rows = post_list.keyset(cursor, per_page + 1)
+    elif cursor is None:
+        direction = CURSOR_OLDER
+        rows = list(post_list.order_by('-pub_date', '-pk')[:per_page + 1])
+    else:
+        direction, pub_date, pk = cursor
+        if direction == CURSOR_OLDER:
+            rows = list(post_list.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            ).order_by('-pub_date', '-pk')[:per_page + 1])
+        else:
+            rows = list(post_list.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            ).order_by('pub_date', 'pk')[:per_page + 1])
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == CURSOR_NEWER:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = cursor is not None, has_more
+
+    if not rows:
+        return CursorPage(rows)
+    return CursorPage(
+        rows,
+        newer_cursor=(
+            encode_cursor(CURSOR_NEWER, rows[0]) if has_newer else None
+        ),
+        older_cursor=(
+            encode_cursor(CURSOR_OLDER, rows[-1]) if has_older else None
+        ),
+    )
+
+
+def paginate_comments(comments, token, per_page=None):
+    """Комментарии после курсора (created, id), старые первыми.
+
+    Возвращает срез и курсор следующего среза или None, если это
+    последний срез.
+    """
+    per_page = per_page or settings.COMMENTS_PER_PAGE
+    cursor = decode_cursor(token) if token else None
+    if cursor is not None:
+        _, created, pk = cursor
+        comments = comments.filter(
+            Q(created__gt=created) | Q(created=created, pk__gt=pk)
+        )
+    rows = list(comments.order_by('created', 'pk')[:per_page + 1])
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, encode_cursor(CURSOR_NEWER, rows[-1], field='created')
+
+
+def get_page_window(number, num_pages,
+                    on_each_side=PAGE_WINDOW_ON_EACH_SIDE,
+                    on_ends=PAGE_WINDOW_ON_ENDS):
+    """Номера страниц вокруг текущей и по краям, None на месте пропуска.
+
+    Размер окна не зависит от общего числа страниц.
+    """
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    window = []
+    if number > 1 + on_each_side + on_ends + 1:
+        window.extend(range(1, on_ends + 1))
+        window.append(None)
+        window.extend(range(number - on_each_side, number + 1))
+    else:
+        window.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        window.extend(range(number + 1, number + on_each_side + 1))
+        window.append(None)
+        window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        window.extend(range(number + 1, num_pages + 1))
+    return window
+
+
+def get_pagination_mode(request, mode=None):
+    """Явный параметр запроса важнее режима по умолчанию."""
+    if 'cursor' in request.GET:
+        return PAGINATION_CURSOR
+    if 'page' in request.GET:
+        return PAGINATION_NUMBERED
+    return mode or settings.POSTS_PAGINATION
 
 
-def paginate_page(request, post_list):
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
+def paginate_page(request, post_list, mode=None):
+    per_page = settings.POSTS_PER_PAGE
+    if get_pagination_mode(request, mode) == PAGINATION_CURSOR:
+        return paginate_cursor(
+            post_list, request.GET.get('cursor'), per_page
+        )
+    paginator = Paginator(post_list, per_page)
     page_number = request.GET.get("page")
-    return paginator.get_page(page_number)
+    page_obj = paginator.get_page(page_number)
+    page_obj.page_window = get_page_window(
+        page_obj.number, paginator.num_pages
+    )
+    return page_obj
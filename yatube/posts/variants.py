@@ -0,0 +1,97 @@
+"""Адаптивные варианты картинок постов для srcset.
+
+Для каждой ширины из POST_IMAGE_WIDTHS, не больше исходной, картинка
+сохраняется в WebP (если Pillow собран с libwebp) и в JPEG как
+запасной формат. Список созданных файлов хранится в
+Post.image_variants, поэтому шаблону не нужно проверять хранилище.
+
+generate_variants не обращается к базе и подходит для пула процессов.
+"""
+import os
+import re
+from hashlib import md5
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+VARIANTS_DIR = 'posts/variants'
+VARIANT_RE = re.compile(r'^(?P<width>\d+)w\.(?P<extension>\w+)$')
+# формат Pillow -> (расширение, MIME-тип)
+FORMATS = {
+    'WEBP': ('webp', 'image/webp'),
+    'JPEG': ('jpg', 'image/jpeg'),
+}
+
+
+def available_formats():
+    """WebP только при поддержке в сборке Pillow, JPEG всегда."""
+    return [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name != 'WEBP' or features.check('webp')
+    ]
+
+
+def variant_name(image_name, width, extension):
+    """Имя варианта зависит от полного имени картинки: у posts/cat.jpg
+    и posts/cat.png разные варианты."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    digest = md5(image_name.encode()).hexdigest()[:8]
+    return f'{VARIANTS_DIR}/{stem}_{digest}_{width}w.{extension}'
+
+
+def generate_variants(image_name, storage=default_storage):
+    """Создаёт варианты картинки и возвращает строку для
+    Post.image_variants: суффиксы вида '480w.webp' через пробел."""
+    with storage.open(image_name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    widths = [
+        width for width in settings.POST_IMAGE_WIDTHS
+        if width < image.width
+    ] + [min(image.width, max(settings.POST_IMAGE_WIDTHS))]
+    created = []
+    for width in sorted(set(widths)):
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for format_name in available_formats():
+            extension = FORMATS[format_name][0]
+            buffer = BytesIO()
+            resized.save(
+                buffer, format_name,
+                quality=settings.POST_IMAGE_QUALITY, optimize=True
+            )
+            name = variant_name(image_name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+            created.append(f'{width}w.{extension}')
+    return ' '.join(created)
+
+
+def split_variants(variants):
+    """Пары (ширина, расширение) из строки Post.image_variants.
+    Непонятные элементы строки пропускаются."""
+    extensions = {extension for extension, _ in FORMATS.values()}
+    for variant in variants.split():
+        match = VARIANT_RE.match(variant)
+        if match is not None and match['extension'] in extensions:
+            yield int(match['width']), match['extension']
+
+
+def parse_variants(image_name, variants):
+    """{MIME-тип: [(url, ширина), ...]} по строке Post.image_variants."""
+    content_types = dict(FORMATS.values())
+    sources = {}
+    for width, extension in split_variants(variants):
+        url = default_storage.url(
+            variant_name(image_name, width, extension)
+        )
+        sources.setdefault(content_types[extension], []).append(
+            (url, width)
+        )
+    return sources
@@ -1,13 +1,20 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from .caching import (AUTHOR_SCOPE, GROUP_SCOPE, INDEX_SCOPE, POST_SCOPE,
+                      TAG_SCOPE, cache_feed, conditional_feed)
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-from .utils import paginate_page
+from .models import Comment, Follow, Post, Tag, User
+from .objects import get_cached_or_404, group_cache, post_cache, user_cache
+from .search import search_posts
+from .tags import TagFeed
+from .timeline import Timeline
+from .uploads import stream_image_uploads
+from .utils import paginate_comments, paginate_page
 
 
-@cache_page(20)
+@conditional_feed(INDEX_SCOPE, per_user=True)
+@cache_feed(INDEX_SCOPE)
 def index(request):
     template_main = 'posts/index.html'
     posts = Post.objects.select_related('author', 'group')
@@ -18,10 +25,12 @@ def index(request):
     return render(request, template_main, context)
 
 
+@conditional_feed(GROUP_SCOPE.format('{slug}'), per_user=True)
+@cache_feed(GROUP_SCOPE.format('{slug}'))
 def group_posts(request, slug):
     template_group = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    group = get_cached_or_404(group_cache, slug=slug)
+    posts = group.posts.select_related('author', 'group')
     page_obj = paginate_page(request, posts)
     context = {
         'page_obj': page_obj,
@@ -30,13 +39,32 @@ def group_posts(request, slug):
     return render(request, template_group, context)
 
 
+@conditional_feed(TAG_SCOPE.format('{name}'), per_user=True)
+@cache_feed(TAG_SCOPE.format('{name}'))
+def tag_posts(request, name):
+    if name != name.lower():
+        return redirect('posts:tag', name=name.lower())
+    tag = get_object_or_404(Tag, name=name)
+    page_obj = paginate_page(request, TagFeed(tag))
+    context = {
+        'page_obj': page_obj,
+        'tag': tag
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
+@conditional_feed(AUTHOR_SCOPE.format('{username}'), per_user=True)
+@cache_feed(AUTHOR_SCOPE.format('{username}'))
 def profile(request, username):
     template_name = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    profile = author.posts.all()
+    author = get_cached_or_404(user_cache, username=username)
+    profile = author.posts.select_related('author', 'group')
     page_obj = paginate_page(request, profile)
     user = request.user
-    following = user.is_authenticated and author.following.exists()
+    following = (
+        user.is_authenticated
+        and author.following.filter(user=user).exists()
+    )
     context = {
         'page_obj': page_obj,
         'author': author,
@@ -45,22 +73,72 @@ def profile(request, username):
     return render(request, template_name, context)
 
 
+def post_author_scope(post_id):
+    """Область автора поста: на странице есть число его постов.
+    Пост и автор берутся из кэша объектов, и 304 обходится без базы."""
+    try:
+        post = post_cache.get(pk=post_id)
+        author = user_cache.get(pk=post.author_id)
+    except (Post.DoesNotExist, User.DoesNotExist):
+        return None
+    return AUTHOR_SCOPE.format(author.username)
+
+
+@conditional_feed(
+    POST_SCOPE.format('{post_id}'), post_author_scope, per_user=True
+)
 def post_detail(request, post_id):
     template_name = 'posts/post_detail.html'
 
     form = CommentForm(request.POST or None)
 
-    post = get_object_or_404(Post, pk=post_id)
-    post_comments = Comment.objects.filter(post_id=post_id)
+    post = get_cached_or_404(post_cache, pk=post_id)
+    post.author = user_cache.get(pk=post.author_id)
+    if post.group_id is not None:
+        post.group = group_cache.get(pk=post.group_id)
+    post_comments, comments_cursor = paginate_comments(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        request.GET.get('comments')
+    )
     context = {
         'form': form,
         'post': post,
         'post_comments': post_comments,
+        'comments_cursor': comments_cursor,
+    }
+    return render(request, template_name, context)
+
+
+def post_comments(request, post_id):
+    """Следующий срез комментариев для кнопки «Показать ещё»."""
+    template_name = 'posts/includes/comments.html'
+    post = get_cached_or_404(post_cache, pk=post_id)
+    post_comments, comments_cursor = paginate_comments(
+        post.comments.select_related('author'),
+        request.GET.get('comments')
+    )
+    context = {
+        'post': post,
+        'post_comments': post_comments,
+        'comments_cursor': comments_cursor,
+    }
+    return render(request, template_name, context)
+
+
+def search(request):
+    template_name = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    results, next_cursor = search_posts(query, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'results': results,
+        'next_cursor': next_cursor,
     }
     return render(request, template_name, context)
 
 
 @login_required
+@stream_image_uploads
 def post_create(request):
     template_name = 'posts/create_post.html'
     form = PostForm(
@@ -80,9 +158,10 @@ def post_create(request):
 
 
 @login_required
+@stream_image_uploads
 def post_edit(request, post_id):
     template_name = 'posts/create_post.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_cached_or_404(post_cache, pk=post_id)
 
     if request.user != post.author:
         return redirect('posts:profile', post.author)
@@ -107,7 +186,7 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_cached_or_404(post_cache, pk=post_id)
     form = CommentForm(request.POST or None)
 
     if form.is_valid():
@@ -121,15 +200,14 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate_page(request, posts)
+    page_obj = paginate_page(request, Timeline(request.user))
 
     return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_cached_or_404(user_cache, username=username)
     user = request.user
     if author != user:
         Follow.objects.get_or_create(user=user, author=author)
@@ -140,9 +218,10 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     user = request.user
+    author = get_cached_or_404(user_cache, username=username)
     qs_follow = Follow.objects.filter(
         user=user,
-        author__username=username
+        author=author
     )
     if qs_follow.exists():
         qs_follow.delete()
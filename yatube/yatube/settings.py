@@ -145,11 +145,108 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# Отдача медиа фронтовым сервером: префикс internal-location nginx для
+# X-Accel-Redirect (например '/protected-media/') или X-Sendfile
+MEDIA_ACCEL_REDIRECT = ''
+MEDIA_SENDFILE = False
+MEDIA_CACHE_MAX_AGE = 60 * 60
+# Пути, содержимое по которым не меняется: кэшируются на год
+MEDIA_IMMUTABLE_PATTERNS = (
+    r'^cache/',
+    r'^posts/variants/',
+    r'^posts/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$',
+)
+
+# Для нескольких воркеров на одном хосте —
+# core.cache.shared.SharedMemoryCache (общий файл в памяти)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.bounded.BoundedCache',
+        'OPTIONS': {
+            'MAX_BYTES': 8 * 2 ** 20,
+            'NAMESPACES': {
+                'pages': {
+                    'PREFIXES': ['views.decorators.cache.'],
+                    'MAX_BYTES': 32 * 2 ** 20,
+                },
+                'fragments': {
+                    'PREFIXES': ['card.', 'sorl-thumbnail||'],
+                    'MAX_BYTES': 16 * 2 ** 20,
+                },
+                'objects': {
+                    'PREFIXES': ['object:'],
+                    'MAX_BYTES': 8 * 2 ** 20,
+                },
+                'counters': {
+                    'PREFIXES': ['generation:', 'timeline:'],
+                    'MAX_BYTES': 4 * 2 ** 20,
+                },
+            },
+        },
     }
 }
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# Сколько последних постов отдавать в RSS и Atom, независимо от запроса
+SYNDICATION_ITEMS = 20
+
+# numbered — страницы с номерами, cursor — курсор по (pub_date, id)
+POSTS_PAGINATION = 'numbered'
+
+# Сколько строк ленты подписок вставлять за один INSERT
+FEED_BATCH_SIZE = 1000
+
+# Авторы, у которых подписчиков не меньше порога, не раскладываются
+# по лентам при записи: их посты подмешиваются при чтении из кэша
+TIMELINE_PULL_THRESHOLD = 5000
+# Обратно в push автор переходит, только когда подписчиков стало меньше
+# порога, умноженного на эту долю: иначе одна подписка туда-обратно
+# на границе вызывала бы раскладку его постов по всем лентам
+TIMELINE_PUSH_RATIO = 0.9
+# Потоки, в которых посты автора раскладываются при возврате в push;
+# 0 — раскладывать сразу после фиксации транзакции
+FEED_WORKERS = 1
+# Сколько держать блокировку такой раскладки, если поток упал
+FEED_RETURN_LOCK_TIMEOUT = 60 * 60
+# Сколько последних постов автора держать в кэше
+TIMELINE_AUTHOR_LENGTH = 200
+TIMELINE_CACHE_TIMEOUT = 60 * 60
+
+# Параметры строки запроса, от которых зависит кэшируемая страница;
+# остальные не попадают в ключ кэша
+CACHE_QUERY_PARAMS = ('page', 'cursor')
+
+# Ленты инвалидируются по поколениям, поэтому хранятся долго
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+# Сколько отдавать устаревшую страницу, пока её пересобирает один запрос
+FEED_CACHE_STALE_TIMEOUT = 60 * 5
+# Коэффициент досрочного обновления страницы, 0 отключает
+FEED_CACHE_EARLY_REFRESH = 1.0
+# Сколько ждать чужой пересборки при холодном промахе
+FEED_CACHE_LOCK_TIMEOUT = 5
+
+# Отрисованные карточки постов: ключ меняется вместе с постом
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Post, Group и User по pk и натуральному ключу; сбрасываются сигналами
+OBJECT_CACHE_TIMEOUT = 60 * 60
+
+# Размеры миниатюр из шаблонов: создаются в фоне после загрузки картинки
+POST_THUMBNAILS = {
+    'card': ('800x600', {'crop': 'center', 'upscale': True}),
+    'detail': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Потоков в пуле; 0 — создавать сразу после фиксации транзакции
+POST_THUMBNAIL_WORKERS = 2
+
+# Ширины вариантов картинки для srcset и их форматы; WebP пропускается,
+# если Pillow собран без libwebp
+POST_IMAGE_WIDTHS = (320, 480, 800, 1200)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_QUALITY = 80
+# Ограничения загружаемой картинки: проверяются при приёме, до Pillow
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Ширина размытой заглушки в пикселях: хранится в посте как data URI
+POST_IMAGE_PLACEHOLDER_WIDTH = 16